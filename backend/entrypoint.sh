@@ -2,5 +2,6 @@
 
 python3 manage.py migrate --no-input
 python3 manage.py collectstatic --no-input
-python3 manage.py loaddata data/ingredients.json
+python3 manage.py load_ingredients data/ingredients.json
+python3 manage.py expire_shopping_cart_exports
 gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
@@ -1,14 +1,37 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import filters, FilterSet
+from rest_framework.filters import BaseFilterBackend
 
-from recipe.models import Tag, Recipe
+from recipe.models import Basket, Favorites, Tag, Recipe
+from recipe.search import ingredient_index
+from recipe.tag_index import cardinality, tag_index, to_ids
 from users.models import User
 
 
+POPULAR_ORDERING = ('-favorites_count', '-in_carts_count', '-id')
+
+
+class IngredientFilter(BaseFilterBackend):
+    search_param = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param)
+        if not term or view.action != 'list':
+            return queryset
+        return ingredient_index.search(term)
+
+
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='filters_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=[('any', 'Любой из тегов'), ('all', 'Все теги')],
+        method='filters_tags_mode',
     )
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all(),
@@ -21,22 +44,68 @@ class RecipeFilter(FilterSet):
         method='filters_shopping_cart',
 
     )
+    ordering = filters.ChoiceFilter(
+        choices=[('popular', 'По популярности')],
+        method='filters_ordering',
+    )
 
     class Meta:
         model = Recipe
         fields = [
             'author',
             'tags',
+            'tags_mode',
             'is_favorited',
             'is_in_shopping_cart',
+            'ordering',
         ]
 
+    def filters_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        require_all = self.form.cleaned_data.get('tags_mode') == 'all'
+        if settings.TAG_INDEX_ENABLED:
+            bitmap = tag_index.match(
+                [tag.id for tag in value],
+                require_all,
+            )
+            if cardinality(bitmap) <= settings.TAG_INDEX_MAX_IDS:
+                return queryset.filter(id__in=to_ids(bitmap))
+        groups = [value] if not require_all else [[tag] for tag in value]
+        for tags in groups:
+            queryset = queryset.filter(
+                Exists(
+                    Recipe.tags.through.objects.filter(
+                        recipe=OuterRef('pk'),
+                        tag__in=tags,
+                    )
+                )
+            )
+        return queryset
+
+    def filters_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def filters_ordering(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_ORDERING)
+
+    def __filter_user_relation(self, queryset, model, value):
+        if not value:
+            return queryset
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                model.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk'),
+                )
+            )
+        )
+
     def filters_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorite__user=self.request.user)
-        return Recipe.objects.all()
+        return self.__filter_user_relation(queryset, Favorites, value)
 
     def filters_shopping_cart(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(basket__user=self.request.user)
-        return Recipe.objects.all()
+        return self.__filter_user_relation(queryset, Basket, value)
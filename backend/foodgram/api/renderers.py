@@ -0,0 +1,34 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class ShoppingCartRenderer(JSONRenderer):
+    """Формат выгрузки списка покупок для ?format=.
+
+    Сами файлы download_cart отдаёт в обход DRF, через HttpResponse и
+    StreamingHttpResponse. Эти рендереры нужны только для того, чтобы
+    DRF не отвечал 404 на неизвестный format, и получают лишь ответы
+    API: ошибки и результат POST. Их рендерер отдаёт как JSON с
+    Content-Type application/json, а не под типом файла.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        content = super().render(data, accepted_media_type, renderer_context)
+        response = (renderer_context or {}).get('response')
+        if response is not None and content:
+            response['Content-Type'] = JSONRenderer.media_type
+        return content
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
@@ -1,7 +1,11 @@
+from django.conf import settings
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from core.validators import validate_ingredients, file_size
+from recipe import shopping_list, similarity
+from recipe.pantry import pantry_index
 from recipe.models import (
     Tag,
     Recipe,
@@ -9,9 +13,10 @@ from recipe.models import (
     Favorites,
     Basket,
     RecipeIngredients,
+    ShoppingCartExport,
     User,
 )
-from users.serializers import MeSerializer
+from users.serializers import SignUpSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -58,7 +63,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(read_only=True, many=True)
-    author = MeSerializer(read_only=True)
+    author = SignUpSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField('get_ingredients')
     is_favorited = serializers.SerializerMethodField('get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -82,22 +87,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
 
     def get_ingredients(self, obj):
-        ingredient = RecipeIngredients.objects.filter(recipe=obj)
-        return IngredientInRecipeSerializer(ingredient, many=True).data
+        ingredients = obj.recipeingredients_set.all()
+        return IngredientInRecipeSerializer(ingredients, many=True).data
 
-    def get_is_favorited(self, obj):
+    def __user_has(self, obj, model, annotation):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         request = self.context.get('request')
-        user = request.user
-        if request is None or user.is_anonymous:
+        if request is None or request.user.is_anonymous:
             return False
-        return Favorites.objects.filter(recipe=obj, user=user).exists()
+        return model.objects.filter(recipe=obj, user=request.user).exists()
+
+    def get_is_favorited(self, obj):
+        return self.__user_has(obj, Favorites, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        user = request.user
-        if request is None or request.user.is_anonymous:
-            return False
-        return Basket.objects.filter(recipe=obj, user=user).exists()
+        return self.__user_has(obj, Basket, 'is_in_shopping_cart')
 
 
 class IngredientsEditSerializer(serializers.ModelSerializer):
@@ -125,17 +130,60 @@ class RecipeEditSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = '__all__'
 
-    def __create_ingredients(self, ingredients, recipe):
+    def __merge_ingredients(self, ingredients):
+        amounts = {}
         for ingredient in ingredients:
-            RecipeIngredients.objects.bulk_create(
-                [
-                    RecipeIngredients(
-                        recipe=recipe,
-                        ingredient_id=ingredient.get('id'),
-                        amount=ingredient.get('amount'),
-                    )
-                ]
+            ingredient_id = int(ingredient.get('id'))
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + int(ingredient.get('amount'))
             )
+        return amounts
+
+    def __create_ingredients(self, amounts, recipe):
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for ingredient_id, amount in amounts.items()
+        ])
+
+    def __update_ingredients(self, amounts, recipe):
+        before = {}
+        kept = {}
+        stale = []
+        for row in RecipeIngredients.objects.filter(recipe=recipe):
+            if row.ingredient_id is not None:
+                before[row.ingredient_id] = (
+                    before.get(row.ingredient_id, 0) + row.amount
+                )
+            if row.ingredient_id in amounts and row.ingredient_id not in kept:
+                kept[row.ingredient_id] = row
+            else:
+                stale.append(row.id)
+        changed = []
+        for ingredient_id, row in kept.items():
+            if row.amount != amounts[ingredient_id]:
+                row.amount = amounts[ingredient_id]
+                changed.append(row)
+        if stale:
+            RecipeIngredients.objects.filter(id__in=stale).delete()
+        RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        self.__create_ingredients(
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in kept
+            },
+            recipe,
+        )
+        shopping_list.refresh_recipe(recipe.id, before)
+        if before.keys() != amounts.keys():
+            similarity.refresh_recipe(recipe.id)
+            transaction.on_commit(lambda: pantry_index.replace(
+                recipe.id, before.keys(), amounts.keys(),
+            ))
 
     def validate_image(self, image):
         file_size(image)
@@ -147,19 +195,27 @@ class RecipeEditSerializer(serializers.ModelSerializer):
         data['ingredients'] = valid_ingredients
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.__create_ingredients(ingredients, recipe)
+        amounts = self.__merge_ingredients(ingredients)
+        self.__create_ingredients(amounts, recipe)
+        similarity.refresh_recipe(recipe.id)
+        transaction.on_commit(
+            lambda: pantry_index.add(recipe.id, amounts.keys())
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.__create_ingredients(ingredients, instance)
+            self.__update_ingredients(
+                self.__merge_ingredients(validated_data.pop('ingredients')),
+                instance,
+            )
         if 'tags' in validated_data:
             instance.tags.set(
                 validated_data.pop('tags')
@@ -193,3 +249,35 @@ class ShoppingCartSerializer(FavoriteSerializer):
     class Meta:
         model = Basket
         fields = ['recipe', 'user']
+
+
+class PantryRecipeSerializer(RecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['coverage']
+
+
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PANTRY_MAX_INGREDIENTS,
+    )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ShoppingCartExportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShoppingCartExport
+        fields = ['id', 'status', 'progress', 'created']
@@ -0,0 +1,270 @@
+import csv
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from fpdf import FPDF
+
+from recipe.models import ShoppingCartExport, ShoppingListItem
+
+logger = logging.getLogger(__name__)
+
+
+class PdfCache:
+    """LRU-кэш готовых PDF, ограниченный суммарным размером в байтах."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._items.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def set(self, key, content):
+        if len(content) > self.max_size:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = content
+            self.size += len(content)
+            while self.size > self.max_size:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'items': len(self._items),
+            'size': self.size,
+        }
+
+
+pdf_cache = PdfCache(settings.SHOPPING_CART_CACHE_SIZE)
+
+
+def shopping_list(user):
+    return ShoppingListItem.objects.filter(
+        user=user,
+        amount__gt=0,
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        ingredient_amount=F('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    )
+
+
+def render_pdf(username, ingredients, progress=None):
+    step = max(len(ingredients) // 10, 1)
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.add_font(
+        'DejaVu',
+        '',
+        './core/fonts/timesnewromanpsmt.ttf',
+        uni=True,
+    )
+    pdf.set_font('DejaVu', size=14)
+    pdf.cell(
+        w=0,
+        txt=f'Список ингредиентов пользователя {username}',
+        align='C',
+    )
+    pdf.ln(10)
+    for index, ingredient in enumerate(ingredients):
+        name = ingredient['ingredient__name']
+        unit = ingredient['ingredient__measurement_unit']
+        amount = ingredient['ingredient_amount']
+        pdf.cell(50, 10, f'{index + 1}) {name} {amount} {unit}')
+        pdf.ln()
+        if progress is not None and index % step == 0:
+            progress(index * 100 // len(ingredients))
+    return bytes(pdf.output())
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(username, ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'measurement_unit', 'amount'])
+    for ingredient in ingredients:
+        yield writer.writerow([
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['ingredient_amount'],
+        ])
+
+
+def stream_txt(username, ingredients):
+    yield f'Список ингредиентов пользователя {username}\n\n'
+    for index, ingredient in enumerate(ingredients):
+        name = ingredient['ingredient__name']
+        unit = ingredient['ingredient__measurement_unit']
+        amount = ingredient['ingredient_amount']
+        yield f'{index + 1}) {name} {amount} {unit}\n'
+
+
+def stream_json(username, ingredients):
+    separator = ''
+    yield '['
+    for ingredient in ingredients:
+        item = json.dumps(
+            {
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['ingredient_amount'],
+            },
+            ensure_ascii=False,
+        )
+        yield f'{separator}{item}'
+        separator = ','
+    yield ']'
+
+
+STREAM_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'txt': (stream_txt, 'text/plain'),
+    'json': (stream_json, 'application/json'),
+}
+
+
+def streamed_shopping_list(user, export_format):
+    stream, content_type = STREAM_FORMATS[export_format]
+    return stream(user.username, shopping_list(user).iterator())
+
+
+def content_key(username, ingredients):
+    content = json.dumps([username, ingredients], ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def keyed_pdf(user, progress=None):
+    ingredients = list(shopping_list(user))
+    key = content_key(user.username, ingredients)
+    content = pdf_cache.get(key)
+    if content is None:
+        content = render_pdf(user.username, ingredients, progress)
+        pdf_cache.set(key, content)
+    return key, content
+
+
+def generated_pdf(user, progress=None):
+    _, content = keyed_pdf(user, progress)
+    return content
+
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.SHOPPING_CART_WORKERS,
+    thread_name_prefix='shopping-cart',
+)
+
+
+def run_export(export_id):
+    exports = ShoppingCartExport.objects.filter(id=export_id)
+    try:
+        exports.update(status=ShoppingCartExport.RUNNING)
+        export = exports.select_related('user').get()
+        key, content = keyed_pdf(
+            export.user,
+            lambda value: exports.update(progress=value),
+        )
+        export.file.save(
+            f'shopping_cart_{export.id}.pdf',
+            ContentFile(content),
+            save=False,
+        )
+        exports.update(
+            file=export.file.name,
+            content_key=key,
+            status=ShoppingCartExport.DONE,
+            progress=100,
+        )
+    except Exception:
+        logger.exception('Не удалось сформировать выгрузку %s', export_id)
+        exports.update(status=ShoppingCartExport.FAILED)
+    finally:
+        connections.close_all()
+
+
+def expire_exports(exports=None):
+    """Удаляет старые выгрузки с файлами, брошенные помечает ошибкой.
+
+    Выгрузка в очереди или в работе дольше
+    SHOPPING_CART_EXPORT_STALE_AFTER осталась от остановленного
+    процесса: она уже не завершится.
+    """
+    exports = ShoppingCartExport.objects.all() if exports is None else exports
+    now = timezone.now()
+    exports.filter(
+        status__in=[ShoppingCartExport.PENDING, ShoppingCartExport.RUNNING],
+        created__lt=now - timedelta(
+            seconds=settings.SHOPPING_CART_EXPORT_STALE_AFTER,
+        ),
+    ).update(status=ShoppingCartExport.FAILED)
+    expired = exports.filter(
+        created__lt=now - timedelta(seconds=settings.SHOPPING_CART_EXPORT_TTL),
+    )
+    deleted = 0
+    for export in expired.iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        deleted += 1
+    return deleted
+
+
+def enqueue_export(user):
+    """Выгрузка текущего списка покупок пользователя.
+
+    Если для того же содержимого уже есть готовая или формируемая
+    выгрузка, возвращается она, а новый файл не создаётся.
+    """
+    exports = ShoppingCartExport.objects.filter(user=user)
+    expire_exports(exports)
+    key = content_key(user.username, list(shopping_list(user)))
+    export = exports.filter(
+        content_key=key,
+        status__in=[
+            ShoppingCartExport.PENDING,
+            ShoppingCartExport.RUNNING,
+            ShoppingCartExport.DONE,
+        ],
+    ).first()
+    if export is not None:
+        return export
+    export = ShoppingCartExport.objects.create(user=user, content_key=key)
+    transaction.on_commit(lambda: executor.submit(run_export, export.id))
+    return export
@@ -0,0 +1,252 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, connections
+from django.http import QueryDict
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.filters import RecipeFilter
+from recipe import shopping_list
+from recipe.models import (
+    Basket,
+    Favorites,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    Tag,
+    TimelineEntry,
+)
+from recipe.tag_index import tag_index
+from users.models import User
+
+
+class RecipeFilterTests(TestCase):
+    """Сочетания фильтров рецептов: без дублей, без DISTINCT, без потерь."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        cls.authors = [
+            User.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+            )
+            for number in range(2)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=slug, slug=slug, color='#111111')
+            for slug in ('breakfast', 'lunch', 'dinner')
+        ]
+        cls.recipes = []
+        for number, (author, tags, favorite, cart) in enumerate([
+            (0, [0, 1], True, True),
+            (0, [0, 1, 2], True, False),
+            (0, [1], False, True),
+            (1, [0, 1], True, True),
+            (0, [], True, True),
+        ]):
+            recipe = Recipe.objects.create(
+                author=cls.authors[author],
+                name=f'recipe {number}',
+                text='text',
+                image='recipe.png',
+                cooking_time=1,
+            )
+            recipe.tags.set([cls.tags[tag] for tag in tags])
+            if favorite:
+                Favorites.objects.create(user=cls.user, recipe=recipe)
+            if cart:
+                Basket.objects.create(user=cls.user, recipe=recipe)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        tag_index.invalidate()
+
+    def filtered(self, **params):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = self.user
+        data = QueryDict(urlencode(params, doseq=True))
+        return RecipeFilter(
+            data,
+            queryset=Recipe.objects.all(),
+            request=request,
+        ).qs
+
+    def assertRecipes(self, queryset, numbers):
+        self.assertNotIn('DISTINCT', str(queryset.query))
+        ids = list(queryset.values_list('id', flat=True))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            set(ids),
+            {self.recipes[number].id for number in numbers},
+        )
+
+    def combined(self, **params):
+        return self.filtered(
+            tags=['breakfast', 'lunch'],
+            author=self.authors[0].id,
+            **params,
+        )
+
+    def test_combined_filters(self):
+        self.assertRecipes(
+            self.combined(is_favorited=1, is_in_shopping_cart=1),
+            [0],
+        )
+
+    def test_all_tags_with_relations(self):
+        self.assertRecipes(
+            self.combined(tags_mode='all', is_favorited=1),
+            [0, 1],
+        )
+
+    def test_false_flags_keep_earlier_filters(self):
+        self.assertRecipes(
+            self.combined(is_favorited=0, is_in_shopping_cart=0),
+            [0, 1, 2],
+        )
+        self.assertRecipes(self.combined(is_favorited=0), [0, 1, 2])
+
+    @override_settings(TAG_INDEX_ENABLED=True)
+    def test_combined_filters_with_tag_index(self):
+        self.assertRecipes(
+            self.combined(is_favorited=1, is_in_shopping_cart=1),
+            [0],
+        )
+        self.assertRecipes(self.combined(is_favorited=0), [0, 1, 2])
+
+    def test_anonymous_favorites_are_empty(self):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        queryset = RecipeFilter(
+            QueryDict('is_favorited=1'),
+            queryset=Recipe.objects.all(),
+            request=request,
+        ).qs
+        self.assertFalse(queryset.exists())
+
+
+class ShoppingCartFormatTests(TestCase):
+    """Ошибки выгрузки списка покупок приходят как JSON при любом format."""
+
+    def test_errors_are_json(self):
+        for export_format in ('pdf', 'csv', 'txt'):
+            response = APIClient().get(
+                '/api/recipes/download_shopping_cart/',
+                {'format': export_format},
+            )
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_401_UNAUTHORIZED,
+            )
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('detail', response.json())
+
+
+class RelationRaceTests(TransactionTestCase):
+    """Одновременные добавления и удаления срабатывают ровно один раз.
+
+    Запросы идут из потоков в настоящих транзакциях; гонку по-настоящему
+    воспроизводит PostgreSQL, sqlite выполняет запись по очереди.
+    """
+
+    threads = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('sqlite в памяти блокирует таблицы целиком')
+        self.user = User.objects.create(
+            username='racer',
+            email='racer@example.com',
+        )
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        ingredient = Ingredient.objects.create(
+            name='соль',
+            measurement_unit='г',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='recipe',
+            text='text',
+            image='recipe.png',
+            cooking_time=1,
+        )
+        RecipeIngredients.objects.create(
+            recipe=self.recipe,
+            ingredient=ingredient,
+            amount=5,
+        )
+
+    def request(self, barrier, method, path):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            return getattr(client, method)(path).status_code
+        finally:
+            connections.close_all()
+
+    def race(self, method, path):
+        barrier = threading.Barrier(self.threads)
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            return sorted(executor.map(
+                lambda _: self.request(barrier, method, path),
+                range(self.threads),
+            ))
+
+    def assertOneWinner(self, statuses, expected):
+        self.assertEqual(
+            statuses,
+            [expected] + [status.HTTP_400_BAD_REQUEST] * (self.threads - 1),
+        )
+
+    def assertConsistent(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            (self.recipe.favorites_count, self.recipe.in_carts_count),
+            (
+                Favorites.objects.filter(recipe=self.recipe).count(),
+                Basket.objects.filter(recipe=self.recipe).count(),
+            ),
+        )
+        self.assertEqual(shopping_list.verify(), {})
+
+    def check_toggle(self, path):
+        for _ in range(3):
+            self.assertOneWinner(
+                self.race('post', path),
+                status.HTTP_201_CREATED,
+            )
+            self.assertConsistent()
+            self.assertOneWinner(
+                self.race('delete', path),
+                status.HTTP_204_NO_CONTENT,
+            )
+            self.assertConsistent()
+
+    def test_favorite(self):
+        self.check_toggle(f'/api/recipes/{self.recipe.id}/favorite/')
+
+    def test_shopping_cart(self):
+        self.check_toggle(f'/api/recipes/{self.recipe.id}/shopping_cart/')
+
+    def test_subscribe(self):
+        self.check_toggle(f'/api/users/{self.author.id}/subscribe/')
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
@@ -1,14 +1,32 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from fpdf import FPDF
-from rest_framework import viewsets, status, filters
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 
-from api.filters import RecipeFilter
-from core.pagination import LargeResultsSetPagination
+from api.filters import POPULAR_ORDERING, IngredientFilter, RecipeFilter
+from core.conditional import ConditionalGetMixin
+from core.pagination import FeedPagination, LargeResultsSetPagination
+from core.relations import (
+    delete_present,
+    insert_missing,
+)
+from recipe import versions
+from recipe.feed import followed_recipes
+from recipe.pantry import covering, pantry_index
 from recipe.models import (
     Tag,
     Recipe,
@@ -16,73 +34,136 @@ from recipe.models import (
     Favorites,
     Basket,
     RecipeIngredients,
+    ShoppingCartExport,
 )
+from recipe.signals import relations_changed
+from users.models import Follow
 from users.serializers import SpecialRecipeSerializer
 from .permissions import ReadOnly
+from .renderers import CSVRenderer, PDFRenderer, TextRenderer
 from .serializers import (
     TagSerializer,
     RecipeSerializer,
     IngredientsSerializer,
+    PantryRecipeSerializer,
+    PantrySerializer,
     RecipeEditSerializer,
+    RecipeIdsSerializer,
+    ShoppingCartExportSerializer,
+)
+from .shopping_cart import (
+    STREAM_FORMATS,
+    enqueue_export,
+    generated_pdf,
+    streamed_shopping_list,
 )
 
 
-def generated_pdf(user):
-    ingredients = RecipeIngredients.objects.filter(
-        recipe__basket__user=user
-    ).values(
-        'ingredient__name',
-        'ingredient__measurement_unit'
-    ).annotate(
-        ingredient_amount=Sum('amount')
-    )
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.add_font(
-        'DejaVu',
-        '',
-        './core/fonts/timesnewromanpsmt.ttf',
-        uni=True,
-    )
-    pdf.set_font('DejaVu', size=14)
-    pdf.cell(
-        w=0,
-        txt=f'Список ингредиентов пользователя {user.username}',
-        align='C',
-    )
-    pdf.ln(10)
-    for index, ingredient in enumerate(ingredients):
-        name = ingredient['ingredient__name']
-        unit = ingredient['ingredient__measurement_unit']
-        amount = ingredient['ingredient_amount']
-        pdf.cell(50, 10, f'{index + 1}) {name} {amount} {unit}')
-        pdf.ln()
-    return pdf.output()
-
-
-class IngredientFilter(filters.SearchFilter):
-    search_param = 'name'
-
-
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [ReadOnly]
 
+    def get_validators(self, request):
+        if self.action != 'list':
+            return None, None
+        [(value, updated)] = versions.current(versions.TAGS)
+        return (versions.TAGS, value), updated
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+
+class IngredientsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = [ReadOnly]
     filter_backends = [IngredientFilter]
-    search_fields = ('name',)
+
+    def get_validators(self, request):
+        if self.action != 'list':
+            return None, None
+        [(value, updated)] = versions.current(versions.INGREDIENTS)
+        return (versions.INGREDIENTS, value), updated
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
     filterset_class = RecipeFilter
-    pagination_class = LargeResultsSetPagination
+    pagination_class = FeedPagination
+
+    @property
+    def cursor_ordering(self):
+        if self.request.query_params.get('ordering') == 'popular':
+            return POPULAR_ORDERING
+        return ('-pub_date', '-id')
+
+    def with_user_flags(self, queryset):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorites.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk'),
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                Basket.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk'),
+                )
+            ),
+        )
+
+    def get_queryset(self):
+        return self.with_user_flags(
+            Recipe.objects.select_related(
+                'author',
+            ).prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipeingredients_set',
+                    queryset=RecipeIngredients.objects.select_related(
+                        'ingredient',
+                    ),
+                ),
+            )
+        )
+
+    def get_validators(self, request):
+        if self.action != 'retrieve':
+            return None, None
+        try:
+            recipe = self.with_user_flags(
+                Recipe.objects.filter(pk=self.kwargs['pk'])
+            ).annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user=request.user.id,
+                        author=OuterRef('author'),
+                    )
+                ),
+            ).values_list(
+                'updated_at',
+                'author__updated',
+                'is_favorited',
+                'is_in_shopping_cart',
+                'is_subscribed',
+            ).first()
+        except (TypeError, ValueError):
+            return None, None
+        if recipe is None:
+            return None, None
+        catalog = versions.current(versions.TAGS, versions.INGREDIENTS)
+        parts = (recipe, request.user.id, [value for value, _ in catalog])
+        if request.user.is_authenticated:
+            return parts, None
+        return parts, max(
+            [*recipe[:2]] + [updated for _, updated in catalog if updated]
+        )
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -94,26 +175,158 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def __added(self, model, user, pk, name):
         recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        with transaction.atomic():
+            added = insert_missing(
+                model, 'recipe_id', [recipe.id], user_id=user.id,
+            )
+            relations_changed(model, user.id, added, 1)
+        if not added:
             return Response(
                 {'errors': f'Вы уже добавили {recipe.name} в {name}'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        model.objects.create(user=user, recipe=recipe)
         serializer = SpecialRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def __deleted(self, model, user, pk, name):
         recipe = get_object_or_404(Recipe, id=pk)
-        removable = model.objects.filter(user=user, recipe=recipe)
-        if not removable.exists():
+        with transaction.atomic():
+            removed = delete_present(
+                model, 'recipe_id', [recipe.id], user_id=user.id,
+            )
+            relations_changed(model, user.id, removed, -1)
+        if not removed:
             return Response(
                 {'errors': f'Вы не добавляли {recipe.name} в {name}'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        removable.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def __bulk(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        if request.method == 'POST':
+            change, sign, done, skipped = insert_missing, 1, 'added', 'exists'
+        else:
+            change, sign, done, skipped = (
+                delete_present, -1, 'removed', 'missing',
+            )
+        with transaction.atomic():
+            changed = change(
+                model, 'recipe_id', sorted(found), user_id=request.user.id,
+            )
+            relations_changed(model, request.user.id, changed, sign)
+        changed = set(changed)
+        return Response([
+            {
+                'id': recipe_id,
+                'status': (
+                    done if recipe_id in changed
+                    else skipped if recipe_id in found
+                    else 'not_found'
+                ),
+            }
+            for recipe_id in ids
+        ])
+
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='similar',
+    )
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        recipes = Recipe.objects.filter(
+            similar_to__recipe=recipe,
+        ).order_by(
+            '-similar_to__score',
+        )
+        serializer = SpecialRecipeSerializer(
+            recipes,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    def ranked_by_index(self, paginator, ingredient_ids):
+        page = paginator.paginate_queryset(
+            pantry_index.match(ingredient_ids),
+            self.request,
+            view=self,
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in page]
+        )
+        ranked = []
+        for coverage, recipe_id in page:
+            if recipe_id in recipes:
+                recipes[recipe_id].coverage = coverage
+                ranked.append(recipes[recipe_id])
+        return ranked
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='pantry',
+    )
+    def pantry(self, request):
+        query = PantrySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ingredient_ids = query.validated_data['ingredients']
+        paginator = LargeResultsSetPagination()
+        if settings.PANTRY_INDEX_ENABLED:
+            page = self.ranked_by_index(paginator, ingredient_ids)
+        else:
+            page = paginator.paginate_queryset(
+                covering(self.get_queryset(), ingredient_ids),
+                request,
+                view=self,
+            )
+        serializer = PantryRecipeSerializer(
+            page,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='feed',
+        permission_classes=[IsAuthenticated],
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(
+            followed_recipes(self.get_queryset(), request.user)
+        )
+        pages = self.paginate_queryset(queryset)
+        serializer = RecipeSerializer(
+            pages,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+    )
+    def favorite_many(self, request):
+        return self.__bulk(request, Favorites)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+    )
+    def shopping_cart_many(self, request):
+        return self.__bulk(request, Basket)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -145,12 +358,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=['get'],
+        methods=['get', 'post'],
         url_path='download_shopping_cart',
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            JSONRenderer,
+            BrowsableAPIRenderer,
+            PDFRenderer,
+            CSVRenderer,
+            TextRenderer,
+        ],
     )
     def download_cart(self, request):
+        if request.method == 'POST':
+            serializer = ShoppingCartExportSerializer(
+                enqueue_export(request.user)
+            )
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        export_format = request.query_params.get('format')
+        if export_format in STREAM_FORMATS:
+            _, content_type = STREAM_FORMATS[export_format]
+            response = StreamingHttpResponse(
+                streamed_shopping_list(request.user, export_format),
+                content_type=f'{content_type}; charset=utf-8',
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_cart.{export_format}"'
+            )
+            return response
         response = HttpResponse(
-            bytes(generated_pdf(request.user)),
+            generated_pdf(request.user),
             content_type='application/pdf',
             status=status.HTTP_200_OK,
         )
@@ -158,3 +395,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'attachment; filename="shopping_cart.pdf"'
         )
         return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'download_shopping_cart/(?P<export_id>\d+)',
+        permission_classes=[IsAuthenticated],
+    )
+    def download_cart_status(self, request, export_id=None):
+        export = get_object_or_404(
+            ShoppingCartExport,
+            id=export_id,
+            user=request.user,
+        )
+        serializer = ShoppingCartExportSerializer(export)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'download_shopping_cart/(?P<export_id>\d+)/file',
+        permission_classes=[IsAuthenticated],
+    )
+    def download_cart_file(self, request, export_id=None):
+        export = get_object_or_404(
+            ShoppingCartExport,
+            id=export_id,
+            user=request.user,
+        )
+        if export.status != ShoppingCartExport.DONE:
+            return Response(
+                {'errors': 'Список покупок ещё не сформирован'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return FileResponse(
+            export.file.open('rb'),
+            as_attachment=True,
+            filename='shopping_cart.pdf',
+            content_type='application/pdf',
+        )
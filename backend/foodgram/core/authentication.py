@@ -0,0 +1,91 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+
+def token_cache_key(key):
+    return f'auth-token:{key}'
+
+
+def user_cache_key(user_id):
+    return f'auth-token-user:{user_id}'
+
+
+class TokenCacheStats:
+    """Счётчики попаданий в кэш токенов текущего процесса."""
+
+    report_every = 1000
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            total = self.hits + self.misses
+        if total % self.report_every == 0:
+            logger.info('Кэш токенов: %s', self.stats())
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
+
+
+token_cache_stats = TokenCacheStats()
+
+
+def token_cache():
+    return caches[settings.TOKEN_CACHE_ALIAS]
+
+
+def invalidate_user(user_id):
+    cache = token_cache()
+    key = cache.get(user_cache_key(user_id))
+    if key is not None:
+        cache.delete_many([token_cache_key(key), user_cache_key(user_id)])
+
+
+def invalidate_token(key):
+    token_cache().delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающий пару токен — пользователь.
+
+    Срок жизни и размер задаёт кэш TOKEN_CACHE_ALIAS. Запись сбрасывается
+    сигналами при выходе, сохранении пользователя (смена пароля,
+    блокировка) и его удалении. Кэш в памяти процесса виден только своему
+    воркеру, поэтому по умолчанию он годится лишь для одного воркера;
+    для нескольких нужен общий бэкенд (TOKEN_CACHE_URL в настройках).
+    """
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        token = cache.get(token_cache_key(key))
+        token_cache_stats.record(token is not None)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set_many({
+                token_cache_key(key): token,
+                user_cache_key(user.id): key,
+            })
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'Пользователь заблокирован или удалён.'
+            )
+        return token.user, token
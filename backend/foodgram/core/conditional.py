@@ -0,0 +1,47 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list/retrieve.
+
+    Валидаторы считаются до сериализации: если клиент прислал
+    актуальные If-None-Match/If-Modified-Since, сразу отдаётся 304.
+    """
+
+    def get_validators(self, request):
+        return None, None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        parts, last_modified = self.get_validators(request)
+        if parts is None:
+            return handler(request, *args, **kwargs)
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        etag = f'"{digest}"'
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=timestamp,
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ['Authorization'])
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,45 @@
+import threading
+import time
+
+
+class CachedIndex:
+    """Индекс в памяти процесса, перестраиваемый по истечении ttl.
+
+    Подкласс читает данные в load() без блокировки и подменяет их в
+    publish() под _lock одним шагом, поэтому чтение во время
+    перестройки видит либо старый, либо новый индекс целиком.
+    Одновременно перестраивает индекс только один поток.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built_at = None
+
+    def invalidate(self):
+        self._built_at = None
+
+    def _is_stale(self):
+        return (
+            self._built_at is None
+            or time.monotonic() - self._built_at > self.ttl
+        )
+
+    def load(self):
+        raise NotImplementedError
+
+    def publish(self, data):
+        raise NotImplementedError
+
+    def build(self):
+        data = self.load()
+        with self._lock:
+            self.publish(data)
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if self._is_stale():
+            with self._build_lock:
+                if self._is_stale():
+                    self.build()
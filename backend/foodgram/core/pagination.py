@@ -1,7 +1,255 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import hashlib
+import json
+from functools import partial
+
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import (
+    EmptyPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LargeResultsSetPagination(PageNumberPagination):
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'page_size'
+
+
+def count_generation_key(db_table):
+    return f'count-generation:{db_table}'
+
+
+def bump_count_generation(model):
+    key = count_generation_key(model._meta.db_table)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def estimated_count(queryset):
+    threshold = settings.COUNT_ESTIMATE_THRESHOLD
+    if (
+        threshold is None
+        or queryset.query.where
+        or connection.vendor != 'postgresql'
+    ):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < threshold:
+        return None
+    return int(row[0])
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с кэшированным COUNT(*).
+
+    Если включена оценка по статистике планировщика, она идёт только
+    в поле count ответа: reltuples между проходами autovacuum бывает
+    меньше настоящего числа строк, поэтому границы страниц и ссылка
+    на следующую определяются выборкой на одну строку больше.
+    """
+
+    def __init__(self, *args, cache_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def estimate(self):
+        return estimated_count(self.object_list)
+
+    @cached_property
+    def count(self):
+        if self.estimate is not None:
+            return self.estimate
+        if self.cache_key is None:
+            return super().count
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, settings.COUNT_CACHE_TTL)
+        return count
+
+    def validate_number(self, number):
+        if self.estimate is None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.estimate is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return EstimatedPage(
+            rows[:self.per_page],
+            number,
+            self,
+            has_next=len(rows) > self.per_page,
+        )
+
+
+class CachedCountPagination(LargeResultsSetPagination):
+    """Кэширует COUNT(*) по тексту запроса.
+
+    В ключ входят поколения всех таблиц, упомянутых в запросе;
+    запись в любую из них меняет поколение и сбрасывает счётчик.
+    """
+
+    def get_count_key(self, queryset):
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return None
+        tables = sorted(
+            model._meta.db_table for model in apps.get_models(
+                include_auto_created=True,
+            )
+            if connection.ops.quote_name(model._meta.db_table) in sql
+        )
+        generations = cache.get_many(
+            [count_generation_key(table) for table in tables]
+        )
+        signature = json.dumps([sql, sorted(generations.items())])
+        return 'count:' + hashlib.md5(signature.encode()).hexdigest()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            cache_key=self.get_count_key(queryset),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по набору полей сортировки.
+
+    Следующая страница выбирается условием по значениям последней
+    записи, поэтому глубина прокрутки не влияет на стоимость запроса.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param, '')
+        if value.isdigit() and int(value) > 0:
+            return min(int(value), self.max_page_size)
+        return self.page_size
+
+    def decode_cursor(self, request, fields):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, fields):
+        values = [field.value_to_string(obj) for field in fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def after(self, position):
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, position):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            name = name.lstrip('-')
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', ('-id',))
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, self.fields)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1], self.fields),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class FeedPagination(CachedCountPagination):
+    """Постраничная пагинация; с параметром cursor — курсорная."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
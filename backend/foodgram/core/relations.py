@@ -0,0 +1,57 @@
+from django.db import connection
+
+
+def _columns(model, names):
+    quote = connection.ops.quote_name
+    return [quote(model._meta.get_field(name).column) for name in names]
+
+
+def insert_missing(model, field, values, **fixed):
+    """Добавляет связи пачкой; возвращает значения field, которых не было.
+
+    Вставка идёт одним запросом INSERT ... ON CONFLICT DO NOTHING
+    RETURNING: в отличие от bulk_create(ignore_conflicts=True) он
+    сообщает, какие строки действительно добавлены. Сигналы при этом
+    не отправляются.
+    """
+    if not values:
+        return []
+    names = [*fixed, field]
+    row = '(' + ', '.join(['%s'] * len(names)) + ')'
+    params = []
+    for value in values:
+        params.extend([*fixed.values(), value])
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = _columns(model, names)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'VALUES {", ".join([row] * len(values))} '
+            f'ON CONFLICT DO NOTHING RETURNING {columns[-1]}',
+            params,
+        )
+        return [value for value, in cursor.fetchall()]
+
+
+def delete_present(model, field, values, **fixed):
+    """Удаляет связи одним DELETE ... RETURNING, без сигналов.
+
+    Возвращает только действительно удалённые значения: при гонке
+    двух запросов строку получает один из них, и побочные эффекты
+    удаления применяются ровно один раз.
+    """
+    if not values:
+        return []
+    table = connection.ops.quote_name(model._meta.db_table)
+    *fixed_columns, column = _columns(model, [*fixed, field])
+    conditions = [f'{name} = %s' for name in fixed_columns]
+    conditions.append(
+        f'{column} IN ({", ".join(["%s"] * len(values))})'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {" AND ".join(conditions)} '
+            f'RETURNING {column}',
+            [*fixed.values(), *values],
+        )
+        return [value for value, in cursor.fetchall()]
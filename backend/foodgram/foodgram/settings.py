@@ -144,6 +144,32 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Без TOKEN_CACHE_URL кэш токенов живёт в памяти процесса: выход,
+    # смена пароля и блокировка сбрасывают его только в обработавшем их
+    # воркере. Это безопасно лишь при одном воркере gunicorn, как в
+    # entrypoint.sh; остальные воркеры принимали бы отозванный токен до
+    # TIMEOUT секунд, поэтому он короткий. Для нескольких воркеров
+    # нужен общий кэш: TOKEN_CACHE_URL=redis://...
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+        'TIMEOUT': 5,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    } if not os.getenv('TOKEN_CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('TOKEN_CACHE_URL'),
+        'TIMEOUT': 60,
+    },
+}
+TOKEN_CACHE_ALIAS = 'tokens'
+
+
 # Rest framework (DRF, Djoser)
 
 REST_FRAMEWORK = {
@@ -152,7 +178,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -172,6 +198,38 @@ DATE_TIME_FORMAT = '%d/%m/%Y %H:%M'
 # Constants
 
 PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+COUNT_CACHE_TTL = 60
+# Число строк, начиная с которого count без фильтров берётся из
+# pg_class.reltuples; None — всегда точный COUNT(*).
+COUNT_ESTIMATE_THRESHOLD = None
 MAX_AMOUNT = 1000
 MIN_AMOUNT = 1
 IMAGE_SIZE = 512 * 1024
+INGREDIENT_INDEX_TTL = 5 * 60
+SHOPPING_CART_CACHE_SIZE = 32 * 1024 * 1024
+SHOPPING_CART_WORKERS = 2
+SHOPPING_CART_EXPORT_TTL = 24 * 60 * 60
+SHOPPING_CART_EXPORT_STALE_AFTER = 10 * 60
+TAG_INDEX_ENABLED = os.getenv('TAG_INDEX_ENABLED', 'false') == 'true'
+TAG_INDEX_TTL = 10 * 60
+TAG_INDEX_MAX_IDS = 5000
+BULK_RECIPES_LIMIT = 100
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_CELEBRITIES_TTL = 60
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_METRIC = 'jaccard'
+SIMILAR_RECIPES_MAX_POSTINGS = 1000
+PANTRY_INDEX_ENABLED = (
+    os.getenv('PANTRY_INDEX_ENABLED', 'false') == 'true'
+)
+PANTRY_INDEX_TTL = 10 * 60
+PANTRY_MAX_INGREDIENTS = 50
+ADMIN_FILTER_CHOICES = 20
+ADMIN_FILTER_TTL = 10 * 60
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 100
+IMPORT_STALE_AFTER = 10 * 60
+BACKUP_CHUNK_SIZE = 5000
+BACKUP_JOBS = 4
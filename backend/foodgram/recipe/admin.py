@@ -1,7 +1,20 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
+from django.db.models import Count
 from django.utils.safestring import mark_safe
 
-from recipe.models import Ingredient, Recipe, Tag, Favorites, Basket
+from recipe import shopping_list, similarity
+from recipe.importer import enqueue_import
+from recipe.pantry import pantry_index
+from recipe.models import (
+    Basket,
+    Favorites,
+    Ingredient,
+    Recipe,
+    RecipeImport,
+    Tag,
+)
 
 
 @admin.register(Ingredient)
@@ -12,10 +25,48 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = (
         'name',
     )
+    ordering = (
+        'name',
+    )
 
 
 class IngredientsInLine(admin.TabularInline):
     model = Recipe.ingredients.through
+    autocomplete_fields = (
+        'ingredient',
+    )
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    """Фильтр по самым активным авторам.
+
+    Полный список авторов потребовал бы DISTINCT по всей таблице
+    рецептов; остальных авторов можно найти поиском.
+    """
+
+    title = 'Автор'
+    parameter_name = 'author'
+    cache_key = 'admin-top-authors'
+
+    def lookups(self, request, model_admin):
+        return cache.get_or_set(
+            self.cache_key,
+            lambda: [
+                (row['author'], row['author__username'])
+                for row in Recipe.objects.values(
+                    'author',
+                    'author__username',
+                ).annotate(
+                    total=Count('id'),
+                ).order_by('-total')[:settings.ADMIN_FILTER_CHOICES]
+            ],
+            settings.ADMIN_FILTER_TTL,
+        )
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author_id=self.value())
+        return queryset
 
 
 @admin.register(Recipe)
@@ -26,28 +77,49 @@ class RecipeAdmin(admin.ModelAdmin):
         'preview',
         'favorite_count',
     )
+    list_select_related = (
+        'author',
+    )
     search_fields = (
         'name',
         'author__username',
-        'tags__name',
     )
     list_filter = (
-        'name',
-        'author__username',
-        'tags__name',
+        'tags',
+        AuthorFilter,
     )
+    autocomplete_fields = (
+        'author',
+        'tags',
+    )
+    show_full_result_count = False
 
     inlines = (
         IngredientsInLine,
     )
 
+    def save_related(self, request, form, formsets, change):
+        before = shopping_list.recipe_amounts(form.instance.id)
+        super().save_related(request, form, formsets, change)
+        shopping_list.refresh_recipe(form.instance.id, before)
+        similarity.refresh_recipe(form.instance.id)
+        pantry_index.replace(
+            form.instance.id,
+            before.keys(),
+            shopping_list.recipe_amounts(form.instance.id).keys(),
+        )
+
     def preview(self, obj):
         return mark_safe(
             f'<img src="{obj.image.url}" style="max-height: 50px;">'
         )
 
+    @admin.display(
+        description='В избранном',
+        ordering='favorites_count',
+    )
     def favorite_count(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 @admin.register(Tag)
@@ -70,6 +142,15 @@ class FavoriteAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+    list_select_related = (
+        'user',
+        'recipe',
+    )
+    autocomplete_fields = (
+        'user',
+        'recipe',
+    )
+    show_full_result_count = False
     search_fields = (
         'user__username',
         'recipe__name',
@@ -83,7 +164,75 @@ class BasketAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+    list_select_related = (
+        'user',
+        'recipe',
+    )
+    autocomplete_fields = (
+        'user',
+        'recipe',
+    )
+    show_full_result_count = False
     search_fields = (
         'user__username',
         'recipe__name',
     )
+
+
+@admin.register(RecipeImport)
+class RecipeImportAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'file',
+        'author',
+        'status',
+        'position',
+        'imported',
+        'failed',
+        'rate',
+        'created',
+    )
+    list_select_related = (
+        'author',
+    )
+    list_filter = (
+        'status',
+    )
+    autocomplete_fields = (
+        'author',
+    )
+    readonly_fields = (
+        'status',
+        'position',
+        'imported',
+        'failed',
+        'errors',
+        'elapsed',
+    )
+    actions = (
+        'resume',
+    )
+
+    def get_changeform_initial_data(self, request):
+        return {'author': request.user.pk}
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('file', *self.readonly_fields)
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            enqueue_import(obj)
+
+    @admin.display(description='Строк/с')
+    def rate(self, obj):
+        return obj.rows_per_second
+
+    @admin.action(description='Продолжить импорт')
+    def resume(self, request, queryset):
+        jobs = queryset & RecipeImport.resumable()
+        for job in jobs:
+            enqueue_import(job)
+        self.message_user(request, f'Поставлено в очередь: {len(jobs)}')
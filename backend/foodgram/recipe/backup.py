@@ -0,0 +1,234 @@
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, time as day_time
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from core.pagination import bump_count_generation
+from recipe import counters, feed, shopping_list
+from recipe.models import Basket, Favorites, Recipe, RecipeIngredients
+from recipe.pantry import pantry_index
+from recipe.tag_index import tag_index
+from users.models import Follow
+
+# Этапы восстановления: модели этапа ссылаются только на предыдущие
+# этапы и на справочники (пользователи, теги, ингредиенты), которые
+# должны быть в базе заранее.
+STAGES = [
+    [Recipe, Follow],
+    [Recipe.tags.through, RecipeIngredients, Favorites, Basket],
+]
+MODELS = [model for stage in STAGES for model in stage]
+
+
+class BackupError(Exception):
+    pass
+
+
+def file_name(model):
+    return f'{model._meta.label_lower}.ndjson.gz'
+
+
+def encode(value):
+    if isinstance(value, (datetime, date, day_time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется')
+
+
+@contextmanager
+def snapshot(name=None):
+    """Транзакция, читающая снимок базы с именем name.
+
+    В PostgreSQL процессы выгрузки подключаются к снимку, который
+    экспортировал родитель, и видят таблицы на один момент времени.
+    Без имени открывает и экспортирует новый снимок.
+    """
+    if connection.vendor != 'postgresql' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield name
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ'
+            )
+            if name is None:
+                cursor.execute('SELECT pg_export_snapshot()')
+                name, = cursor.fetchone()
+            else:
+                cursor.execute('SET TRANSACTION SNAPSHOT %s', [name])
+        yield name
+
+
+def dump_model(label, directory, chunk_size, snapshot_name=None):
+    """Выгружает таблицу в gzip с NDJSON: заголовок, затем строки.
+
+    Строки читаются серверным курсором по chunk_size, поэтому память
+    не зависит от размера таблицы.
+    """
+    started = time.perf_counter()
+    model = apps.get_model(label)
+    fields = [field.attname for field in model._meta.concrete_fields]
+    rows = 0
+    path = os.path.join(directory, file_name(model))
+    with snapshot(snapshot_name), gzip.open(path, 'wt') as target:
+        target.write(json.dumps({'model': label, 'fields': fields}) + '\n')
+        for row in model._base_manager.order_by('pk').values_list(
+            *fields,
+        ).iterator(chunk_size=chunk_size):
+            target.write(
+                json.dumps(row, ensure_ascii=False, default=encode) + '\n'
+            )
+            rows += 1
+    return label, rows, time.perf_counter() - started
+
+
+def insert_rows(model, fields, rows):
+    """Вставляет строки как есть; уже существующие ключи пропускает.
+
+    Запрос пишется вручную: bulk_create подставил бы текущее время в
+    поля auto_now и auto_now_add.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'VALUES {", ".join([row] * len(batch))} '
+                'ON CONFLICT DO NOTHING',
+                [value for values in batch for value in values],
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+def read_header(source, model):
+    header = json.loads(source.readline() or 'null')
+    if not header or header.get('model') != model._meta.label:
+        raise BackupError(f'{source.name}: это выгрузка не {model}')
+    fields = {
+        field.attname: field for field in model._meta.concrete_fields
+    }
+    unknown = set(header['fields']) - fields.keys()
+    if unknown:
+        raise BackupError(
+            f'{source.name}: нет полей {", ".join(sorted(unknown))}'
+        )
+    return [fields[name] for name in header['fields']]
+
+
+def restore_model(label, directory, chunk_size):
+    """Загружает выгрузку таблицы пачками по chunk_size строк.
+
+    Каждая пачка — отдельная транзакция, а существующие ключи
+    пропускаются, поэтому прерванное восстановление можно повторить.
+    """
+    started = time.perf_counter()
+    model = apps.get_model(label)
+    rows = inserted = 0
+    path = os.path.join(directory, file_name(model))
+    with gzip.open(path, 'rt') as source:
+        fields = read_header(source, model)
+        while chunk := list(islice(source, chunk_size)):
+            values = [
+                [
+                    field.get_db_prep_save(
+                        field.to_python(value),
+                        connection,
+                    )
+                    for field, value in zip(fields, json.loads(line))
+                ]
+                for line in chunk
+            ]
+            with transaction.atomic():
+                inserted += insert_rows(model, fields, values)
+            rows += len(chunk)
+    return label, rows, inserted, time.perf_counter() - started
+
+
+def run(function, models, jobs, *args):
+    """Выполняет function для каждой модели, до jobs процессов сразу.
+
+    Процессы запускаются методом spawn: они не наследуют соединение
+    родителя, которое держит открытым снимок выгрузки.
+    """
+    labels = [model._meta.label for model in models]
+    if jobs <= 1 or len(labels) == 1:
+        return [function(label, *args) for label in labels]
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(labels)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    ) as executor:
+        return list(executor.map(
+            function,
+            labels,
+            *[[arg] * len(labels) for arg in args],
+        ))
+
+
+def dump(directory, jobs=None, chunk_size=None):
+    os.makedirs(directory, exist_ok=True)
+    with snapshot() as name:
+        return run(
+            dump_model,
+            MODELS,
+            jobs or settings.BACKUP_JOBS,
+            directory,
+            chunk_size or settings.BACKUP_CHUNK_SIZE,
+            name,
+        )
+
+
+def reset_sequences(models):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def restore(directory, jobs=None, chunk_size=None, progress=None):
+    """Восстанавливает таблицы по этапам, модели этапа — параллельно.
+
+    Строки пишутся без сигналов, поэтому затем сбрасываются
+    последовательности ключей и пересчитывается всё, что обычно
+    поддерживают сигналы: счётчики, списки покупок, ленты, индексы.
+    Похожие рецепты пересчитывает rebuild_similar_recipes.
+    """
+    results = []
+    for stage in STAGES:
+        stage_results = run(
+            restore_model,
+            stage,
+            jobs or settings.BACKUP_JOBS,
+            directory,
+            chunk_size or settings.BACKUP_CHUNK_SIZE,
+        )
+        if progress is not None:
+            for result in stage_results:
+                progress(*result)
+        results.extend(stage_results)
+    reset_sequences(MODELS)
+    counters.reconcile()
+    shopping_list.rebuild()
+    feed.rebuild()
+    for model in MODELS:
+        bump_count_generation(model)
+    tag_index.invalidate()
+    pantry_index.invalidate()
+    return results
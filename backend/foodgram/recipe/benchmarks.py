@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe.models import Ingredient, Recipe, RecipeIngredients
+from users.models import User
+
+
+def timed(operation):
+    started = time.perf_counter()
+    result = operation()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def populate(size, chunk_size, ingredients=0, tags=()):
+    """Создаёт size тестовых рецептов пачками по chunk_size.
+
+    У каждого рецепта до ingredients ингредиентов, выбранных с весами
+    по закону Ципфа, и один-два тега из tags. Возвращает id
+    ингредиентов в порядке убывания веса.
+    """
+    author = User.objects.create(
+        username='benchmark', email='benchmark@example.com',
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    weights = [1 / rank for rank in range(1, len(ingredient_ids) + 1)]
+    through = Recipe.tags.through
+    for start in range(0, size, chunk_size):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=f'benchmark {number}',
+                text='benchmark',
+                image='benchmark.png',
+                cooking_time=1,
+            )
+            for number in range(start, min(start + chunk_size, size))
+        ])
+        if ingredients:
+            RecipeIngredients.objects.bulk_create([
+                RecipeIngredients(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    amount=1,
+                )
+                for recipe in recipes
+                for ingredient_id in set(random.choices(
+                    ingredient_ids, weights, k=ingredients,
+                ))
+            ])
+        if tags:
+            through.objects.bulk_create([
+                through(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe in recipes
+                for tag in random.sample(tags, random.randint(1, 2))
+            ])
+    return ingredient_ids
+
+
+class BenchmarkCommand(BaseCommand):
+    """Основа команд-замеров: таблица «рецептов, операция, мс, найдено»."""
+
+    def header(self):
+        self.stdout.write(
+            f'{"recipes":>9} {"operation":<22} {"ms":>10} {"found":>9}'
+        )
+
+    def report(self, size, name, elapsed, found=''):
+        self.stdout.write(f'{size:>9} {name:<22} {elapsed:>10.1f} {found:>9}')
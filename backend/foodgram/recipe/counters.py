@@ -0,0 +1,50 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipe.models import Basket, Favorites, Recipe
+
+COUNTERS = {
+    Favorites: 'favorites_count',
+    Basket: 'in_carts_count',
+}
+
+
+def change(model, recipe_id, delta):
+    change_many(model, [recipe_id], delta)
+
+
+def change_many(model, recipe_ids, delta):
+    field = COUNTERS[model]
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_counts():
+    return {
+        field: Coalesce(
+            Subquery(
+                model.objects.filter(
+                    recipe=OuterRef('pk'),
+                ).order_by().values(
+                    'recipe',
+                ).annotate(
+                    total=Count('id'),
+                ).values('total')
+            ),
+            Value(0),
+        )
+        for model, field in COUNTERS.items()
+    }
+
+
+def reconcile():
+    actual = actual_counts()
+    drifted = Recipe.objects.annotate(
+        **{f'actual_{field}': value for field, value in actual.items()}
+    ).exclude(
+        **{field: F(f'actual_{field}') for field in actual}
+    ).count()
+    if drifted:
+        Recipe.objects.update(**actual)
+    return drifted
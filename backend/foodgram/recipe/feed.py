@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from recipe.models import Recipe, TimelineEntry
+from users.models import Follow
+
+CELEBRITIES_KEY = 'feed-celebrities'
+
+
+def followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values_list(
+        'user_id',
+        flat=True,
+    )
+
+
+def is_celebrity(author_id):
+    limit = settings.FEED_FANOUT_LIMIT
+    return len(followers(author_id)[:limit + 1]) > limit
+
+
+def celebrities():
+    return cache.get_or_set(
+        CELEBRITIES_KEY,
+        lambda: set(
+            Follow.objects.values('author').annotate(
+                total=Count('id'),
+            ).filter(
+                total__gt=settings.FEED_FANOUT_LIMIT,
+            ).values_list('author', flat=True)
+        ),
+        settings.FEED_CELEBRITIES_TTL,
+    )
+
+
+def fan_out(recipe):
+    fan_out_many(recipe.author_id, [recipe.id])
+
+
+def fan_out_many(author_id, recipe_ids):
+    """Раскладывает новые рецепты автора по лентам его подписчиков.
+
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+    не раскладываются: лента подмешивает их при чтении.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    user_ids = list(followers(author_id)[:limit + 1])
+    if len(user_ids) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in recipe_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id,
+    ).order_by(
+        '-pub_date',
+        '-id',
+    ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def rebuild():
+    """Заново раскладывает ленты по подпискам, как при миграции."""
+    authors = {}
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id',
+        'author_id',
+    ).iterator():
+        authors.setdefault(author_id, []).append(user_id)
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        for author_id, user_ids in authors.items():
+            if len(user_ids) > settings.FEED_FANOUT_LIMIT:
+                continue
+            recipe_ids = Recipe.objects.filter(
+                author_id=author_id,
+            ).order_by(
+                '-pub_date',
+                '-id',
+            ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE]
+            TimelineEntry.objects.bulk_create(
+                [
+                    TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in recipe_ids
+                    for user_id in user_ids
+                ],
+                batch_size=1000,
+            )
+    cache.delete(CELEBRITIES_KEY)
+
+
+def forget(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        recipe__author_id=author_id,
+    ).delete()
+
+
+def followed_recipes(queryset, user):
+    """Рецепты из ленты пользователя и от популярных авторов подписок.
+
+    Автор, опустившийся ниже порога, снова раскладывается при записи;
+    рецепты, вышедшие, пока он был выше порога, в ленты не попадают.
+    """
+    condition = Q(Exists(
+        TimelineEntry.objects.filter(user=user, recipe=OuterRef('pk'))
+    ))
+    followed = Follow.objects.filter(
+        user=user,
+        author__in=celebrities(),
+    ).values_list('author', flat=True)
+    if followed:
+        condition |= Q(author__in=list(followed))
+    return queryset.filter(condition)
@@ -0,0 +1,293 @@
+import base64
+import binascii
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from core.pagination import bump_count_generation
+from recipe import feed
+from recipe.models import (
+    Ingredient,
+    Recipe,
+    RecipeImport,
+    RecipeIngredients,
+    Tag,
+)
+from recipe.pantry import pantry_index
+from recipe.search import normalize
+from recipe.tag_index import tag_index
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class RowError(ValueError):
+    pass
+
+
+def ndjson_records(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            yield number, RowError(f'неверный JSON: {error}')
+
+
+def split_list(value):
+    return [item.strip() for item in (value or '').split('|') if item.strip()]
+
+
+def csv_records(lines):
+    """Строки CSV: теги — слаги через «|», ингредиенты — «id:кол-во|…».
+
+    Вместо id ингредиента можно указать его название. Номер записи —
+    строка файла, с которой она начинается: поле в кавычках может
+    занимать несколько строк.
+    """
+    reader = csv.DictReader(lines)
+    end = 1
+    for row in reader:
+        number, end = end + 1, reader.line_num
+        ingredients = []
+        for item in split_list(row.get('ingredients')):
+            key, _, amount = item.rpartition(':')
+            ingredients.append({'id': key, 'amount': amount})
+        yield number, {
+            **row,
+            'tags': split_list(row.get('tags')),
+            'ingredients': ingredients,
+        }
+
+
+READERS = {
+    '.ndjson': ndjson_records,
+    '.jsonl': ndjson_records,
+    '.csv': csv_records,
+}
+
+
+def records(file):
+    """Пары (номер строки файла, запись)."""
+    reader = READERS.get(os.path.splitext(file.name)[1].lower())
+    if reader is None:
+        raise RowError(f'неизвестный формат файла {file.name}')
+    return reader(codecs.iterdecode(file, 'utf-8-sig'))
+
+
+def positive(value, field):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field}: нужно целое число')
+    if not settings.MIN_AMOUNT <= value <= settings.MAX_AMOUNT:
+        raise RowError(
+            f'{field}: от {settings.MIN_AMOUNT} до {settings.MAX_AMOUNT}'
+        )
+    return value
+
+
+def stored_image(value):
+    if not value:
+        raise RowError('image: обязательное поле')
+    if not value.startswith('data:'):
+        return value
+    try:
+        header, data = value.split(';base64,')
+        content = base64.b64decode(data, validate=True)
+    except (ValueError, binascii.Error):
+        raise RowError('image: неверный base64')
+    extension = header.rpartition('/')[2]
+    return default_storage.save(
+        f'recipe/images/{uuid.uuid4()}.{extension}',
+        ContentFile(content),
+    )
+
+
+class Lookups:
+    """Справочники импорта в памяти: ингредиенты, теги, авторы."""
+
+    def __init__(self):
+        self.ingredients = {}
+        for ingredient_id, name in Ingredient.objects.order_by(
+            '-id',
+        ).values_list('id', 'name'):
+            self.ingredients[str(ingredient_id)] = ingredient_id
+            self.ingredients[normalize(name)] = ingredient_id
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.authors = {}
+
+    def load_authors(self, usernames):
+        missing = set(usernames) - self.authors.keys()
+        if missing:
+            self.authors.update(
+                User.objects.filter(
+                    username__in=missing,
+                ).values_list('username', 'id')
+            )
+
+    def ingredient(self, key):
+        ingredient_id = self.ingredients.get(normalize(str(key)))
+        if ingredient_id is None:
+            raise RowError(f'неизвестный ингредиент {key}')
+        return ingredient_id
+
+    def tag(self, slug):
+        if slug not in self.tags:
+            raise RowError(f'неизвестный тег {slug}')
+        return self.tags[slug]
+
+    def author(self, username, default):
+        if not username:
+            return default
+        if username not in self.authors:
+            raise RowError(f'неизвестный автор {username}')
+        return self.authors[username]
+
+
+def prepare_amounts(items, lookups):
+    amounts = {}
+    for item in items or []:
+        if not isinstance(item, dict):
+            raise RowError('ingredients: нужен список объектов')
+        ingredient_id = lookups.ingredient(item.get('id') or item.get('name'))
+        amounts[ingredient_id] = amounts.get(ingredient_id, 0) + positive(
+            item.get('amount'), 'amount',
+        )
+    if not amounts:
+        raise RowError('ingredients: обязательное поле')
+    return amounts
+
+
+def prepare(record, lookups, default_author):
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise RowError('строка должна быть объектом')
+    if not record.get('name'):
+        raise RowError('name: обязательное поле')
+    amounts = prepare_amounts(record.get('ingredients'), lookups)
+    recipe = Recipe(
+        author_id=lookups.author(record.get('author'), default_author),
+        name=str(record['name'])[:200],
+        text=record.get('text') or '',
+        cooking_time=positive(record.get('cooking_time'), 'cooking_time'),
+        image=stored_image(record.get('image')),
+    )
+    tag_ids = {lookups.tag(slug) for slug in record.get('tags') or []}
+    return recipe, amounts, tag_ids
+
+
+def import_chunk(job, chunk, lookups):
+    lookups.load_authors(
+        record['author'] for _, record in chunk
+        if isinstance(record, dict) and record.get('author')
+    )
+    prepared = []
+    errors = []
+    for number, record in chunk:
+        try:
+            prepared.append(prepare(record, lookups, job.author_id))
+        except RowError as error:
+            errors.append(f'строка {number}: {error}')
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            [recipe for recipe, _, _ in prepared]
+        )
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for recipe, amounts, _ in prepared
+            for ingredient_id, amount in amounts.items()
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, _, tag_ids in prepared
+            for tag_id in tag_ids
+        ])
+        by_author = {}
+        for recipe in recipes:
+            by_author.setdefault(recipe.author_id, []).append(recipe.id)
+        for author_id, recipe_ids in by_author.items():
+            feed.fan_out_many(author_id, recipe_ids)
+        job.position += len(chunk)
+        job.imported += len(recipes)
+        job.failed += len(errors)
+        job.errors = '\n'.join(
+            (job.errors.splitlines() + errors)[:settings.IMPORT_MAX_ERRORS]
+        )
+        job.save(update_fields=[
+            'position', 'imported', 'failed', 'errors', 'updated',
+        ])
+    for model in (Recipe, RecipeIngredients, Recipe.tags.through):
+        bump_count_generation(model)
+
+
+def run_import(import_id, chunk_size=None, progress=None):
+    """Загружает файл импорта с места, на котором он остановился.
+
+    Каждая пачка строк записывается bulk_create в своей транзакции
+    вместе с новой позицией, поэтому повторный запуск продолжает
+    ровно с первой незаписанной записи. Сигналы при этом не
+    отправляются: индексы тегов и продуктов сбрасываются в конце,
+    похожие рецепты пересчитывает rebuild_similar_recipes.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    job = RecipeImport.objects.get(pk=import_id)
+    if job.status == RecipeImport.DONE:
+        return job
+    job.status = RecipeImport.RUNNING
+    job.save(update_fields=['status', 'updated'])
+    started = time.perf_counter() - job.elapsed
+    try:
+        with job.file.open('rb') as file:
+            rows = islice(records(file), job.position, None)
+            lookups = Lookups()
+            while chunk := list(islice(rows, chunk_size)):
+                import_chunk(job, chunk, lookups)
+                job.elapsed = time.perf_counter() - started
+                job.save(update_fields=['elapsed', 'updated'])
+                if progress is not None:
+                    progress(job)
+        job.status = RecipeImport.DONE
+    except Exception:
+        logger.exception('Импорт %s прерван', import_id)
+        job.status = RecipeImport.FAILED
+    finally:
+        job.elapsed = time.perf_counter() - started
+        job.save(update_fields=['status', 'elapsed', 'updated'])
+        tag_index.invalidate()
+        pantry_index.invalidate()
+    return job
+
+
+executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix='recipe-import',
+)
+
+
+def run_in_background(import_id):
+    try:
+        run_import(import_id)
+    finally:
+        connections.close_all()
+
+
+def enqueue_import(job):
+    transaction.on_commit(lambda: executor.submit(run_in_background, job.id))
@@ -0,0 +1,69 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+
+from recipe.benchmarks import BenchmarkCommand, populate, timed
+from recipe.models import Recipe
+from recipe.pantry import PantryIndex, covering
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает подбор рецептов по продуктам через SQL и через '
+        'битовые карты. Тестовые рецепты создаются во временной '
+        'транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 100000, 1000000],
+        )
+        parser.add_argument('--query', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-sql',
+            action='store_true',
+            help='Не замерять запрос к базе.',
+        )
+
+    def sql_page(self, ingredient_ids):
+        queryset = covering(Recipe.objects.all(), ingredient_ids)
+        return queryset.count(), list(
+            queryset.values_list('id', flat=True)[:settings.PAGE_SIZE]
+        )
+
+    def index_page(self, index, ingredient_ids):
+        match = index.match(ingredient_ids)
+        return len(match), match[0:settings.PAGE_SIZE]
+
+    def handle(self, *args, **options):
+        self.header()
+        for size in options['sizes']:
+            with transaction.atomic():
+                ingredient_ids = populate(
+                    size,
+                    options['chunk_size'],
+                    ingredients=options['ingredients'],
+                )
+                query = random.sample(
+                    ingredient_ids[:len(ingredient_ids) // 4],
+                    options['query'],
+                )
+                index = PantryIndex(ttl=float('inf'))
+                _, elapsed = timed(index.build)
+                self.report(size, 'index build', elapsed)
+                if not options['skip_sql']:
+                    (found, _), elapsed = timed(
+                        lambda: self.sql_page(query)
+                    )
+                    self.report(size, 'sql page', elapsed, found)
+                (found, _), elapsed = timed(
+                    lambda: self.index_page(index, query)
+                )
+                self.report(size, 'bitmap page', elapsed, found)
+                transaction.set_rollback(True)
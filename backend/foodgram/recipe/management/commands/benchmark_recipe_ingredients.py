@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import RecipeEditSerializer
+from recipe.models import Ingredient, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число запросов и время записи ингредиентов рецепта. '
+        'Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[5, 50, 500],
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, operation):
+        timings = []
+        for _ in range(self.repeat):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    operation()
+                    timings.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+        return len(queries), statistics.median(timings) * 1000
+
+    def report(self, size, name, operation):
+        queries, elapsed = self.measure(operation)
+        self.stdout.write(
+            f'{size:>6} {name:<14} {queries:>8} {elapsed:>10.1f}'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < max(options['sizes']) * 2:
+            raise CommandError('Недостаточно ингредиентов в базе.')
+        self.stdout.write(f'{"size":>6} {"operation":<14} {"queries":>8} '
+                          f'{"ms":>10}')
+        with transaction.atomic():
+            author = User.objects.create(
+                username='benchmark', email='benchmark@example.com',
+            )
+            tags = [Tag.objects.create(name='benchmark', slug='benchmark')]
+            for size in options['sizes']:
+                self.benchmark(size, author, tags, ingredient_ids)
+            transaction.set_rollback(True)
+
+    def benchmark(self, size, author, tags, ingredient_ids):
+        serializer = RecipeEditSerializer()
+
+        def data(ids, amount=1):
+            return {
+                'author': author,
+                'name': 'benchmark',
+                'text': 'benchmark',
+                'cooking_time': 1,
+                'tags': tags,
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': amount}
+                    for ingredient_id in ids
+                ],
+            }
+
+        ids = ingredient_ids[:size]
+        self.report(size, 'create', lambda: serializer.create(data(ids)))
+        recipe = serializer.create(data(ids))
+
+        def changed():
+            payload = data(ids)
+            payload['ingredients'][0]['amount'] = 2
+            return payload
+
+        self.report(
+            size, 'update one',
+            lambda: serializer.update(recipe, changed()),
+        )
+        replaced = ids[:size // 2] + ingredient_ids[size:size + size // 2]
+        self.report(
+            size, 'replace half',
+            lambda: serializer.update(recipe, data(replaced)),
+        )
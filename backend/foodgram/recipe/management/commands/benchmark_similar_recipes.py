@@ -0,0 +1,55 @@
+import random
+
+from django.db import transaction
+
+from recipe import similarity
+from recipe.benchmarks import BenchmarkCommand, populate, timed
+from recipe.models import RecipeIngredients
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Замеряет пересчёт похожих рецептов. Тестовые рецепты '
+        'создаются во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 100000],
+        )
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.header()
+        for size in options['sizes']:
+            with transaction.atomic():
+                RecipeIngredients.objects.all().delete()
+                populate(
+                    size,
+                    options['chunk_size'],
+                    ingredients=options['ingredients'],
+                )
+                sets, elapsed = timed(similarity.ingredient_sets)
+                self.report(size, 'load', elapsed)
+                matrix, elapsed = timed(
+                    lambda: similarity.SimilarityMatrix(sets)
+                )
+                self.report(size, 'matrix', elapsed)
+                sample = random.sample(list(sets), min(len(sets), 1000))
+                _, elapsed = timed(
+                    lambda: [matrix.neighbours(pk) for pk in sample]
+                )
+                self.report(size, 'top-k x1000', elapsed)
+                _, elapsed = timed(
+                    lambda: similarity.rebuild(options['chunk_size'])
+                )
+                self.report(size, 'full rebuild', elapsed)
+                _, elapsed = timed(
+                    lambda: similarity.refresh_recipe(sample[0])
+                )
+                self.report(size, 'refresh one', elapsed)
+                transaction.set_rollback(True)
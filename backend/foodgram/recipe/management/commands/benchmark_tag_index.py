@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from django.test.utils import override_settings
+
+from api.filters import RecipeFilter
+from recipe.benchmarks import BenchmarkCommand, populate, timed
+from recipe.models import Recipe, Tag
+from recipe.tag_index import cardinality, tag_index
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает фильтрацию рецептов по тегам через SQL и через '
+        'битовые карты: RecipeFilter с выключенным и включённым '
+        'индексом. Тестовые рецепты создаются во временной транзакции '
+        'и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 100000, 1000000],
+        )
+        parser.add_argument('--tags', type=int, default=6)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def filtered_page(self, tags, require_all, use_index):
+        data = QueryDict(mutable=True)
+        data.setlist('tags', [tag.slug for tag in tags])
+        if require_all:
+            data['tags_mode'] = 'all'
+        with override_settings(TAG_INDEX_ENABLED=use_index):
+            queryset = RecipeFilter(data, queryset=Recipe.objects.all()).qs
+            return queryset.count(), list(
+                queryset.values_list('id', flat=True)[:settings.PAGE_SIZE]
+            )
+
+    def handle(self, *args, **options):
+        self.header()
+        for size in options['sizes']:
+            with transaction.atomic():
+                tags = [
+                    Tag.objects.create(
+                        name=f'benchmark {number}',
+                        slug=f'benchmark-{number}',
+                    )
+                    for number in range(options['tags'])
+                ]
+                populate(size, options['chunk_size'], tags=tags)
+                _, elapsed = timed(tag_index.build)
+                self.report(size, 'index build', elapsed)
+                for require_all in (False, True):
+                    mode = 'and' if require_all else 'or'
+                    ids = [tag.id for tag in tags[:2]]
+                    found, elapsed = timed(
+                        lambda: cardinality(tag_index.match(ids, require_all))
+                    )
+                    self.report(size, f'bitmap {mode}', elapsed, found)
+                    for use_index, name in ((False, 'sql'), (True, 'index')):
+                        (found, _), elapsed = timed(
+                            lambda: self.filtered_page(
+                                tags[:2], require_all, use_index,
+                            )
+                        )
+                        self.report(
+                            size, f'filter {name} {mode}', elapsed, found,
+                        )
+                transaction.set_rollback(True)
+            tag_index.invalidate()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipe import backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты, их состав и теги, избранное, корзины и '
+        'подписки в сжатые NDJSON-файлы, по таблице на процесс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--jobs', type=int)
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        results = backup.dump(
+            options['directory'],
+            options['jobs'],
+            options['chunk_size'],
+        )
+        for label, rows, elapsed in results:
+            self.stdout.write(f'{label}: {rows} строк за {elapsed:.1f} с')
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка записана в {options["directory"]}'
+        ))
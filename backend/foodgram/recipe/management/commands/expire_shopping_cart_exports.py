@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.shopping_cart import expire_exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет выгрузки списка покупок старше SHOPPING_CART_EXPORT_TTL '
+        'вместе с файлами и помечает ошибкой брошенные выгрузки.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = expire_exports()
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено выгрузок: {deleted}')
+        )
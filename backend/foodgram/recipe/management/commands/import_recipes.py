@@ -0,0 +1,66 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import run_import
+from recipe.models import RecipeImport
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из NDJSON или CSV пачками. Прерванный импорт '
+        'продолжается с места остановки через --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?')
+        parser.add_argument(
+            '--author',
+            help='Логин автора для строк без поля author.',
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            help='Номер прерванного импорта.',
+        )
+        parser.add_argument('--chunk-size', type=int)
+
+    def create_import(self, path, username):
+        if not path or not username:
+            raise CommandError('Укажите файл и --author либо --resume.')
+        try:
+            author = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+        job = RecipeImport(author=author)
+        with open(path, 'rb') as source:
+            job.file.save(os.path.basename(path), File(source))
+        return job
+
+    def report(self, job):
+        self.stdout.write(
+            f'строк: {job.position}, рецептов: {job.imported}, '
+            f'ошибок: {job.failed}, {job.rows_per_second} строк/с'
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = RecipeImport.objects.filter(pk=options['resume']).first()
+            if job is None:
+                raise CommandError(f'Импорт {options["resume"]} не найден.')
+        else:
+            job = self.create_import(options['path'], options['author'])
+        self.stdout.write(f'Импорт {job.pk}: {job.file.name}')
+        job = run_import(job.pk, options['chunk_size'], self.report)
+        if job.errors:
+            self.stdout.write(job.errors)
+        if job.status != RecipeImport.DONE:
+            raise CommandError(
+                f'Импорт прерван, продолжить: --resume {job.pk}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {job.imported} рецептов, {job.rows_per_second} '
+            'строк/с. Похожие рецепты: rebuild_similar_recipes.'
+        ))
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from core.pagination import bump_count_generation
+from recipe import versions
+from recipe.models import Ingredient
+from recipe.search import ingredient_index
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fixture_objects(path, block_size=64 * 1024):
+    """Объекты JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    with open(path, encoding='utf-8') as source:
+        for block in iter(lambda: source.read(block_size), ''):
+            buffer = (buffer + block).lstrip('[, \t\r\n')
+            while buffer and not buffer.startswith(']'):
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    break
+                yield item
+                buffer = buffer[end:].lstrip(', \t\r\n')
+    if buffer.strip() not in ('', ']'):
+        raise CommandError(f'Файл {path} обрывается на «{buffer[:40]}»')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает справочник ингредиентов из фикстуры. Если файл '
+        'не менялся с прошлой загрузки, ничего не делает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='data/ingredients.json',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Загрузить, даже если контрольная сумма совпадает.',
+        )
+
+    def upsert(self, objects, chunk_size):
+        total = 0
+        while chunk := list(islice(objects, chunk_size)):
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(pk=item['pk'], **item['fields'])
+                    for item in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['name', 'measurement_unit'],
+            )
+            total += len(chunk)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Ingredient],
+            ):
+                cursor.execute(sql)
+        return total
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        checksum = file_checksum(options['path'])
+        if (
+            not options['force']
+            and versions.checksum(versions.INGREDIENTS) == checksum
+        ):
+            self.stdout.write(
+                f'Справочник не изменился, пропущено за '
+                f'{time.perf_counter() - started:.2f} с'
+            )
+            return
+        with transaction.atomic():
+            total = self.upsert(
+                fixture_objects(options['path']),
+                options['chunk_size'],
+            )
+            versions.bump(versions.INGREDIENTS, checksum=checksum)
+        ingredient_index.invalidate()
+        bump_count_generation(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено ингредиентов: {total} за '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает списки покупок и сверяет их с корзинами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Только сверить, не пересобирая.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            shopping_list.rebuild()
+            self.stdout.write('Списки покупок пересобраны.')
+        mismatches = shopping_list.verify()
+        for (user_id, ingredient_id), (expected, actual) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидалось {expected}, в таблице {actual}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
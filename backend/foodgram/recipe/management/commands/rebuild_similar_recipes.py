@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe import similarity
+from recipe.models import SimilarRecipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты по общим ингредиентам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        similarity.rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано пар: {SimilarRecipe.objects.count()} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipe import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного и корзин у рецептов.'
+
+    def handle(self, *args, **options):
+        drifted = counters.reconcile()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено рецептов: {drifted}')
+        )
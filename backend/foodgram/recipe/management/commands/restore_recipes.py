@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку dump_recipes пачками. Пользователи, теги и '
+        'ингредиенты должны быть в базе заранее; строки с уже '
+        'существующими ключами пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--jobs', type=int)
+        parser.add_argument('--chunk-size', type=int)
+
+    def report(self, label, rows, inserted, elapsed):
+        self.stdout.write(
+            f'{label}: {rows} строк, добавлено {inserted} '
+            f'за {elapsed:.1f} с'
+        )
+
+    def handle(self, *args, **options):
+        missing = [
+            backup.file_name(model) for model in backup.MODELS
+            if not os.path.exists(
+                os.path.join(options['directory'], backup.file_name(model))
+            )
+        ]
+        if missing:
+            raise CommandError(f'Нет файлов: {", ".join(missing)}')
+        try:
+            backup.restore(
+                options['directory'],
+                options['jobs'],
+                options['chunk_size'],
+                self.report,
+            )
+        except backup.BackupError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Счётчики, списки покупок и ленты пересчитаны. '
+            'Похожие рецепты: rebuild_similar_recipes.'
+        ))
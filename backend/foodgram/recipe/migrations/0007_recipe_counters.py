@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 18:34
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    counters = {
+        'favorites_count': apps.get_model('recipe', 'Favorites'),
+        'in_carts_count': apps.get_model('recipe', 'Basket'),
+    }
+    Recipe.objects.update(**{
+        field: Coalesce(
+            models.Subquery(
+                model.objects.filter(
+                    recipe=models.OuterRef('pk'),
+                ).order_by().values(
+                    'recipe',
+                ).annotate(
+                    total=models.Count('id'),
+                ).values('total')
+            ),
+            models.Value(0),
+        )
+        for field, model in counters.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-in_carts_count', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.RunPython(
+            fill_counters,
+            migrations.RunPython.noop,
+        ),
+    ]
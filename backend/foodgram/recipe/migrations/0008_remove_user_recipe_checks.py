@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 18:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='basket',
+            name='basketuniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='favorites',
+            name='favoriteuniq',
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-18 18:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    TimelineEntry = apps.get_model('recipe', 'TimelineEntry')
+    followers = {}
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id',
+        'author_id',
+    ).iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id, user_ids in followers.items():
+        if len(user_ids) > settings.FEED_FANOUT_LIMIT:
+            continue
+        recipe_ids = Recipe.objects.filter(
+            author_id=author_id,
+        ).order_by(
+            '-pub_date',
+            '-id',
+        ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in recipe_ids
+                for user_id in user_ids
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0008_remove_user_recipe_checks'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipe.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='uniquetimelineentry'),
+        ),
+        migrations.RunPython(
+            fill_timelines,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0010_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/', verbose_name='Файл NDJSON или CSV')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершён'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('imported', models.PositiveIntegerField(default=0, verbose_name='Загружено рецептов')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Отклонено строк')),
+                ('errors', models.TextField(blank=True, verbose_name='Ошибки')),
+                ('elapsed', models.FloatField(default=0, verbose_name='Время работы, с')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_imports', to=settings.AUTH_USER_MODEL, verbose_name='Автор по умолчанию')),
+            ],
+            options={
+                'verbose_name': 'Импорт рецептов',
+                'verbose_name_plural': 'Импорт рецептов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
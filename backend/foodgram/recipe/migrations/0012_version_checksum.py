@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_recipeimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='version',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Контрольная сумма загруженного файла'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0012_version_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimport',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последняя активность'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_recipeimport_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcartexport',
+            name='content_key',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Ключ содержимого'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartexport',
+            index=models.Index(fields=['user', 'content_key'], name='export_user_content_idx'),
+        ),
+    ]
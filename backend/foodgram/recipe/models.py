@@ -1,9 +1,12 @@
+from datetime import timedelta
+
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import DateTimeField
+from django.db.models import DateTimeField, Q
 from django.conf import settings
+from django.utils import timezone
 
 from core.validators import file_size
 
@@ -93,11 +96,33 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В корзинах',
+        default=0,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-in_carts_count', '-id'],
+                name='recipe_popular_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -154,10 +179,6 @@ class Favorites(models.Model):
                 fields=['user', 'recipe'],
                 name='uniquefavorit'
             ),
-            models.CheckConstraint(
-                check=~models.Q(user=models.F('recipe')),
-                name='favoriteuniq'
-            )
         ]
 
 
@@ -182,8 +203,261 @@ class Basket(models.Model):
                 fields=['user', 'recipe'],
                 name='uniquebasket'
             ),
-            models.CheckConstraint(
-                check=~models.Q(user=models.F('recipe')),
-                name='basketuniq'
-            )
         ]
+
+
+class ShoppingCartExport(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Формируется'),
+        (DONE, 'Готов'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_cart_exports',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    progress = models.PositiveSmallIntegerField(
+        verbose_name='Готовность, %',
+        default=0,
+    )
+    file = models.FileField(
+        verbose_name='Файл',
+        upload_to='shopping_cart/',
+        blank=True,
+    )
+    content_key = models.CharField(
+        verbose_name='Ключ содержимого',
+        max_length=64,
+        blank=True,
+    )
+    created = DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списка покупок'
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['user', 'content_key'],
+                name='export_user_content_idx',
+            ),
+        ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='uniqueshoppinglistitem'
+            ),
+        ]
+
+
+class Version(models.Model):
+    name = models.CharField(
+        verbose_name='Раздел',
+        max_length=50,
+        unique=True,
+    )
+    value = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        default=0,
+    )
+    checksum = models.CharField(
+        verbose_name='Контрольная сумма загруженного файла',
+        max_length=64,
+        blank=True,
+    )
+    updated = DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='uniquetimelineentry'
+            ),
+        ]
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='similar_recipes',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        related_name='similar_to',
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='uniquesimilarrecipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx',
+            ),
+        ]
+
+
+class RecipeImport(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершён'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    author = models.ForeignKey(
+        User,
+        related_name='recipe_imports',
+        on_delete=models.CASCADE,
+        verbose_name='Автор по умолчанию',
+    )
+    file = models.FileField(
+        verbose_name='Файл NDJSON или CSV',
+        upload_to='imports/',
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    position = models.PositiveIntegerField(
+        verbose_name='Обработано строк',
+        default=0,
+    )
+    imported = models.PositiveIntegerField(
+        verbose_name='Загружено рецептов',
+        default=0,
+    )
+    failed = models.PositiveIntegerField(
+        verbose_name='Отклонено строк',
+        default=0,
+    )
+    errors = models.TextField(
+        verbose_name='Ошибки',
+        blank=True,
+    )
+    elapsed = models.FloatField(
+        verbose_name='Время работы, с',
+        default=0,
+    )
+    created = DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    updated = DateTimeField(
+        verbose_name='Последняя активность',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Импорт рецептов'
+        verbose_name_plural = 'Импорт рецептов'
+        ordering = ['-created']
+
+    def __str__(self):
+        return self.file.name
+
+    @classmethod
+    def resumable(cls):
+        """Незавершённые импорты, включая брошенные упавшим процессом.
+
+        Работающий импорт обновляет updated после каждой пачки; если
+        этого не было дольше IMPORT_STALE_AFTER, процесс считается
+        погибшим.
+        """
+        stale = timezone.now() - timedelta(
+            seconds=settings.IMPORT_STALE_AFTER,
+        )
+        return cls.objects.filter(
+            Q(status__in=[cls.PENDING, cls.FAILED])
+            | Q(status=cls.RUNNING, updated__lt=stale)
+        )
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return None
+        return round(self.position / self.elapsed, 1)
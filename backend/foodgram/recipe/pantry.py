@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast
+
+from core.indexes import CachedIndex
+from recipe.models import RecipeIngredients
+from recipe.tag_index import BYTE_BITS, cardinality, to_bitmap
+
+
+def covering(queryset, ingredient_ids):
+    """Рецепты с долей имеющихся ингредиентов, запросом к базе."""
+    return queryset.filter(
+        Exists(
+            RecipeIngredients.objects.filter(
+                recipe=OuterRef('pk'),
+                ingredient__in=ingredient_ids,
+            )
+        ),
+    ).annotate(
+        matched=Count(
+            'recipeingredients__ingredient',
+            filter=Q(recipeingredients__ingredient__in=ingredient_ids),
+            distinct=True,
+        ),
+        total=Count('recipeingredients__ingredient', distinct=True),
+        coverage=Cast('matched', FloatField()) / F('total'),
+    ).order_by('-coverage', '-matched', '-id')
+
+
+def highest_ids(bitmap, start, stop):
+    """Id из карты по убыванию, срез [start:stop]."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'big')
+    top = len(data) - 1
+    ids = []
+    seen = 0
+    for index, byte in enumerate(data):
+        if not byte:
+            continue
+        for bit in reversed(BYTE_BITS[byte]):
+            if seen >= start:
+                ids.append((top - index) * 8 + bit)
+            seen += 1
+            if seen >= stop:
+                return ids
+    return ids
+
+
+class PantryMatch:
+    """Рецепты, ранжированные по доле имеющихся ингредиентов.
+
+    Число совпавших ингредиентов у каждого рецепта хранится в битовых
+    плоскостях: карта каждого ингредиента прибавляется к ним как число,
+    и одна операция над целыми обрабатывает сразу все рецепты. Рецепты
+    с m совпадениями из s ингредиентов — пересечение двух карт, группы
+    (m, s) перебираются по убыванию m / s.
+    """
+
+    def __init__(self, bitmaps, sizes):
+        self.sizes = sizes
+        self.limit = len(bitmaps)
+        self.found = 0
+        self.planes = []
+        for bitmap in bitmaps:
+            self.found |= bitmap
+            carry = bitmap
+            for position, plane in enumerate(self.planes):
+                if not carry:
+                    break
+                self.planes[position] = plane ^ carry
+                carry &= plane
+            if carry:
+                self.planes.append(carry)
+        self._matched = {}
+
+    def matched(self, count):
+        if count not in self._matched:
+            bitmap = self.found if count < 1 << len(self.planes) else 0
+            for position, plane in enumerate(self.planes):
+                bitmap &= plane if count >> position & 1 else ~plane
+            self._matched[count] = bitmap
+        return self._matched[count]
+
+    def groups(self):
+        return sorted(
+            (
+                (matched, size)
+                for matched in range(1, self.limit + 1)
+                for size in self.sizes
+                if size >= matched
+            ),
+            key=lambda group: (-group[0] / group[1], -group[0]),
+        )
+
+    def __len__(self):
+        return cardinality(self.found)
+
+    def __getitem__(self, window):
+        start, stop = window.start or 0, window.stop
+        ranked = []
+        for matched, size in self.groups():
+            if stop <= 0:
+                break
+            bitmap = self.matched(matched) & self.sizes[size]
+            if not bitmap:
+                continue
+            total = cardinality(bitmap)
+            if start < total:
+                ranked.extend(
+                    (matched / size, recipe_id)
+                    for recipe_id in highest_ids(bitmap, start, stop)
+                )
+            start = max(start - total, 0)
+            stop -= total
+        return ranked
+
+
+class PantryIndex(CachedIndex):
+    """Инвертированный индекс ингредиент → рецепты в битовых картах.
+
+    Кроме карт ингредиентов хранятся карты рецептов по числу
+    ингредиентов в них: они нужны, чтобы считать долю совпадений.
+    """
+
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._bitmaps = {}
+        self._sizes = {}
+
+    def load(self):
+        rows = RecipeIngredients.objects.filter(
+            recipe__isnull=False,
+            ingredient__isnull=False,
+        ).order_by()
+        ids = {}
+        for ingredient_id, recipe_id in rows.values_list(
+            'ingredient_id',
+            'recipe_id',
+        ).iterator(chunk_size=10000):
+            ids.setdefault(ingredient_id, []).append(recipe_id)
+        bitmaps = {
+            ingredient_id: to_bitmap(recipe_ids)
+            for ingredient_id, recipe_ids in ids.items()
+        }
+        ids = {}
+        for recipe_id, size in rows.values_list('recipe_id').annotate(
+            size=Count('ingredient_id', distinct=True),
+        ).iterator(chunk_size=10000):
+            ids.setdefault(size, []).append(recipe_id)
+        sizes = {
+            size: to_bitmap(recipe_ids)
+            for size, recipe_ids in ids.items()
+        }
+        return bitmaps, sizes
+
+    def publish(self, data):
+        self._bitmaps, self._sizes = data
+
+    def add(self, recipe_id, ingredient_ids):
+        if self._built_at is None or not ingredient_ids:
+            return
+        bit = 1 << recipe_id
+        ingredient_ids = set(ingredient_ids)
+        with self._lock:
+            for ingredient_id in ingredient_ids:
+                self._bitmaps[ingredient_id] = (
+                    self._bitmaps.get(ingredient_id, 0) | bit
+                )
+            size = len(ingredient_ids)
+            self._sizes[size] = self._sizes.get(size, 0) | bit
+
+    def remove(self, recipe_id, ingredient_ids=None):
+        if self._built_at is None:
+            return
+        mask = ~(1 << recipe_id)
+        with self._lock:
+            if ingredient_ids is None:
+                ingredient_ids = list(self._bitmaps)
+            for ingredient_id in ingredient_ids:
+                if ingredient_id in self._bitmaps:
+                    self._bitmaps[ingredient_id] &= mask
+            for size in self._sizes:
+                self._sizes[size] &= mask
+
+    def replace(self, recipe_id, before, after):
+        self.remove(recipe_id, before)
+        self.add(recipe_id, after)
+
+    def match(self, ingredient_ids):
+        self._ensure_built()
+        with self._lock:
+            bitmaps = [
+                self._bitmaps.get(ingredient_id, 0)
+                for ingredient_id in set(ingredient_ids)
+            ]
+            sizes = dict(self._sizes)
+        return PantryMatch(bitmaps, sizes)
+
+
+pantry_index = PantryIndex(settings.PANTRY_INDEX_TTL)
@@ -0,0 +1,109 @@
+import bisect
+from collections import namedtuple
+
+from django.conf import settings
+
+from core.indexes import CachedIndex
+from recipe.models import Ingredient
+
+
+def normalize(value):
+    return value.lower().replace('ё', 'е').strip()
+
+
+def trigrams(value):
+    padded = f'  {value} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+IngredientData = namedtuple(
+    'IngredientData',
+    ['items', 'keys', 'postings', 'sizes'],
+)
+
+
+class IngredientIndex(CachedIndex):
+    """Поиск ингредиентов по названию без обращения к базе.
+
+    Сначала идут совпадения по началу названия, затем по подстроке;
+    если таких нет, используется нечёткий поиск по триграммам.
+    """
+
+    similarity = 0.3
+
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._data = IngredientData([], [], {}, [])
+
+    def load(self):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (normalize(ingredient.name), ingredient.id),
+        )
+        keys = [normalize(ingredient.name) for ingredient in ingredients]
+        postings = {}
+        sizes = []
+        for position, key in enumerate(keys):
+            key_trigrams = trigrams(key)
+            sizes.append(len(key_trigrams))
+            for trigram in key_trigrams:
+                postings.setdefault(trigram, set()).add(position)
+        return IngredientData(ingredients, keys, postings, sizes)
+
+    def publish(self, data):
+        self._data = data
+
+    def _prefix(self, data, query):
+        start = bisect.bisect_left(data.keys, query)
+        end = start
+        while end < len(data.keys) and data.keys[end].startswith(query):
+            end += 1
+        return list(range(start, end))
+
+    def _substring(self, data, query):
+        query_trigrams = {
+            query[i:i + 3] for i in range(len(query) - 2)
+        }
+        if query_trigrams:
+            candidates = set.intersection(*(
+                data.postings.get(trigram, set())
+                for trigram in query_trigrams
+            ))
+        else:
+            candidates = range(len(data.keys))
+        return sorted(
+            position for position in candidates
+            if query in data.keys[position]
+            and not data.keys[position].startswith(query)
+        )
+
+    def _fuzzy(self, data, query):
+        query_trigrams = trigrams(query)
+        shared = {}
+        for trigram in query_trigrams:
+            for position in data.postings.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        scored = []
+        for position, common in shared.items():
+            score = common / (
+                len(query_trigrams) + data.sizes[position] - common
+            )
+            if score >= self.similarity:
+                scored.append((-score, position))
+        return [position for _, position in sorted(scored)]
+
+    def search(self, term):
+        self._ensure_built()
+        data = self._data
+        query = normalize(term)
+        if not query:
+            return list(data.items)
+        positions = (
+            self._prefix(data, query) + self._substring(data, query)
+        )
+        if not positions:
+            positions = self._fuzzy(data, query)
+        return [data.items[position] for position in positions]
+
+
+ingredient_index = IngredientIndex(settings.INGREDIENT_INDEX_TTL)
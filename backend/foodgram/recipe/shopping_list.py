@@ -0,0 +1,131 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipe.models import Basket, RecipeIngredients, ShoppingListItem
+
+
+def recipe_amounts(recipe_id):
+    return recipes_amounts([recipe_id])
+
+
+def recipes_amounts(recipe_ids):
+    return dict(
+        RecipeIngredients.objects.filter(
+            recipe_id__in=recipe_ids,
+            ingredient__isnull=False,
+        ).values_list(
+            'ingredient_id',
+        ).annotate(
+            total=Sum('amount'),
+        )
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items()
+        if delta
+    }
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=deltas,
+        )
+        items.update(amount=F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            default=Value(0),
+        ))
+        items.filter(amount__lte=0).delete()
+
+
+def add_recipe(user_id, recipe_id, sign=1):
+    add_recipes(user_id, [recipe_id], sign)
+
+
+def add_recipes(user_id, recipe_ids, sign=1):
+    apply_deltas(
+        [user_id],
+        {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in recipes_amounts(recipe_ids).items()
+        },
+    )
+
+
+def refresh_recipe(recipe_id, before):
+    after = recipe_amounts(recipe_id)
+    deltas = {
+        ingredient_id: after.get(ingredient_id, 0) - before.get(
+            ingredient_id, 0
+        )
+        for ingredient_id in before.keys() | after.keys()
+    }
+    apply_deltas(
+        list(Basket.objects.filter(
+            recipe_id=recipe_id,
+        ).values_list('user_id', flat=True)),
+        deltas,
+    )
+
+
+def live_shopping_lists():
+    return RecipeIngredients.objects.filter(
+        recipe__basket__isnull=False,
+        ingredient__isnull=False,
+    ).values_list(
+        'recipe__basket__user_id',
+        'ingredient_id',
+    ).annotate(
+        total=Sum('amount'),
+    ).order_by()
+
+
+def rebuild(chunk_size=1000):
+    rows = live_shopping_lists().iterator(chunk_size=chunk_size)
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        while chunk := list(islice(rows, chunk_size)):
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=total,
+                )
+                for user_id, ingredient_id, total in chunk
+            ])
+
+
+def verify():
+    expected = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total
+        in live_shopping_lists().iterator()
+    }
+    actual = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount',
+        ).iterator()
+    }
+    return {
+        key: (expected.get(key), actual.get(key))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key) != actual.get(key)
+    }
@@ -0,0 +1,120 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.pagination import bump_count_generation
+from recipe import counters, feed, shopping_list, versions
+from recipe.models import Basket, Favorites, Ingredient, Recipe, Tag
+from recipe.pantry import pantry_index
+from recipe.search import ingredient_index
+from recipe.tag_index import tag_index
+from users.models import Follow
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    versions.bump(versions.INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tags_version(**kwargs):
+    versions.bump(versions.TAGS)
+
+
+@receiver(post_delete, sender=Tag)
+def remove_tag_from_index(instance, **kwargs):
+    tag_index.remove_tag(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_index(instance, **kwargs):
+    tag_index.remove(instance.id)
+    pantry_index.remove(instance.id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tag_index(instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            tag_index.remove_tag(instance.id)
+        else:
+            tag_index.remove(instance.id)
+        return
+    update = {
+        'post_add': tag_index.add,
+        'post_remove': tag_index.remove,
+    }.get(action)
+    if update is None:
+        return
+    if reverse:
+        for recipe_id in pk_set:
+            update(recipe_id, [instance.id])
+    else:
+        update(instance.id, pk_set)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(instance, **kwargs):
+    feed.forget(instance.user_id, instance.author_id)
+
+
+def relations_changed(model, user_id, recipe_ids, sign):
+    """Повторяет работу сигналов для связей, изменённых пачкой в обход ORM."""
+    if not recipe_ids:
+        return
+    counters.change_many(model, recipe_ids, sign)
+    if model is Basket:
+        shopping_list.add_recipes(user_id, recipe_ids, sign)
+    bump_count_generation(model)
+
+
+@receiver(post_save, sender=Basket)
+def add_to_shopping_list(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Basket)
+def remove_from_shopping_list(instance, **kwargs):
+    shopping_list.add_recipe(instance.user_id, instance.recipe_id, sign=-1)
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=Basket)
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(sender, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=Basket)
+def decrement_counter(sender, instance, **kwargs):
+    counters.change(sender, instance.recipe_id, -1)
+
+
+@receiver([post_save, post_delete])
+def invalidate_counts(sender, **kwargs):
+    bump_count_generation(sender)
+
+
+@receiver(m2m_changed)
+def invalidate_relation_counts(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_count_generation(sender)
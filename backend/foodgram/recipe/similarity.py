@@ -0,0 +1,223 @@
+import heapq
+import math
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from recipe.models import RecipeIngredients, SimilarRecipe
+
+
+def jaccard(shared, size, other_size):
+    return shared / (size + other_size - shared)
+
+
+def cosine(shared, size, other_size):
+    return shared / math.sqrt(size * other_size)
+
+
+METRICS = {
+    'jaccard': jaccard,
+    'cosine': cosine,
+}
+
+
+def ingredient_sets():
+    sets = {}
+    rows = RecipeIngredients.objects.filter(
+        recipe__isnull=False,
+        ingredient__isnull=False,
+    ).values_list('recipe_id', 'ingredient_id').order_by()
+    for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+        sets.setdefault(recipe_id, set()).add(ingredient_id)
+    return sets
+
+
+def top_neighbours(recipe_id, shared, sizes, count=None, metric=None):
+    """Лучшие соседи по числу общих ингредиентов с каждым кандидатом."""
+    score = METRICS[metric or settings.SIMILAR_RECIPES_METRIC]
+    size = sizes[recipe_id]
+    return heapq.nlargest(
+        count or settings.SIMILAR_RECIPES_COUNT,
+        (
+            (score(common, size, sizes[other_id]), other_id)
+            for other_id, common in shared.items()
+            if other_id != recipe_id
+        ),
+    )
+
+
+class SimilarityMatrix:
+    """Разреженная матрица рецепт × ингредиент.
+
+    Строки хранятся множествами ингредиентов, столбцы — списками
+    рецептов. Число общих ингредиентов рецепта с остальными — строка
+    произведения A·Aᵀ — собирается обходом его столбцов. Столбцы длиннее
+    SIMILAR_RECIPES_MAX_POSTINGS (соль, вода) кандидатов не дают: иначе
+    каждый рецепт сравнивался бы почти со всеми. В счёт общих
+    ингредиентов они всё равно входят.
+    """
+
+    def __init__(self, sets, max_postings=None):
+        self.sets = sets
+        self.max_postings = (
+            max_postings or settings.SIMILAR_RECIPES_MAX_POSTINGS
+        )
+        self.sizes = {
+            recipe_id: len(ingredients)
+            for recipe_id, ingredients in sets.items()
+        }
+        self.postings = {}
+        for recipe_id, ingredients in sets.items():
+            for ingredient_id in ingredients:
+                self.postings.setdefault(ingredient_id, []).append(recipe_id)
+
+    def shared(self, recipe_id):
+        counts = Counter()
+        frequent = set()
+        for ingredient_id in self.sets[recipe_id]:
+            posting = self.postings[ingredient_id]
+            if len(posting) > self.max_postings:
+                frequent.add(ingredient_id)
+            else:
+                counts.update(posting)
+        if frequent:
+            for other_id in counts:
+                counts[other_id] += len(frequent & self.sets[other_id])
+        return counts
+
+    def neighbours(self, recipe_id, count=None, metric=None):
+        return top_neighbours(
+            recipe_id, self.shared(recipe_id), self.sizes, count, metric,
+        )
+
+    def rows(self, count=None, metric=None):
+        for recipe_id in self.sets:
+            for score, similar_id in self.neighbours(
+                recipe_id, count, metric,
+            ):
+                yield SimilarRecipe(
+                    recipe_id=recipe_id,
+                    similar_id=similar_id,
+                    score=score,
+                )
+
+
+def rebuild(chunk_size=5000):
+    rows = SimilarityMatrix(ingredient_sets()).rows()
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        while chunk := list(islice(rows, chunk_size)):
+            SimilarRecipe.objects.bulk_create(chunk)
+
+
+def refresh_recipe(recipe_id):
+    """Обновляет соседей рецепта после смены его ингредиентов.
+
+    Строка рецепта считается заново, а в чужих списках рецепт
+    добавляется, переоценивается или удаляется. Освободившееся место
+    в чужом списке заполнит только полная пересборка.
+    """
+    ingredient_ids = set(
+        RecipeIngredients.objects.filter(
+            recipe_id=recipe_id,
+            ingredient__isnull=False,
+        ).values_list('ingredient_id', flat=True)
+    )
+    rare = RecipeIngredients.objects.filter(
+        ingredient_id__in=ingredient_ids,
+        recipe__isnull=False,
+    ).values('ingredient_id').annotate(
+        postings=Count('recipe_id', distinct=True),
+    ).filter(
+        postings__lte=settings.SIMILAR_RECIPES_MAX_POSTINGS,
+    ).values('ingredient_id')
+    candidates = RecipeIngredients.objects.filter(
+        ingredient_id__in=rare,
+    ).values('recipe_id')
+    shared = dict(
+        RecipeIngredients.objects.filter(
+            recipe_id__in=candidates,
+            ingredient_id__in=ingredient_ids,
+        ).exclude(
+            recipe_id=recipe_id,
+        ).values_list(
+            'recipe_id',
+        ).annotate(
+            common=Count('ingredient_id', distinct=True),
+        ).order_by()
+    )
+    sizes = dict(
+        RecipeIngredients.objects.filter(
+            recipe_id__in=shared,
+            ingredient__isnull=False,
+        ).values_list(
+            'recipe_id',
+        ).annotate(
+            size=Count('ingredient_id', distinct=True),
+        ).order_by()
+    )
+    sizes[recipe_id] = len(ingredient_ids)
+    scores = {
+        other_id: score
+        for score, other_id in top_neighbours(
+            recipe_id, shared, sizes, count=len(shared),
+        )
+    }
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id=recipe_id).delete()
+        SimilarRecipe.objects.bulk_create([
+            SimilarRecipe(
+                recipe_id=recipe_id,
+                similar_id=other_id,
+                score=score,
+            )
+            for score, other_id in heapq.nlargest(
+                settings.SIMILAR_RECIPES_COUNT,
+                ((score, other_id) for other_id, score in scores.items()),
+            )
+        ])
+        update_lists(recipe_id, scores)
+
+
+def update_lists(recipe_id, scores):
+    scores = dict(scores)
+    listed = SimilarRecipe.objects.filter(similar_id=recipe_id)
+    listed.exclude(recipe_id__in=scores).delete()
+    rows = list(listed.filter(recipe_id__in=scores))
+    for row in rows:
+        row.score = scores.pop(row.recipe_id)
+    SimilarRecipe.objects.bulk_update(rows, ['score'])
+    lists = SimilarRecipe.objects.filter(recipe_id__in=scores).annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=F('recipe_id'),
+            order_by=[F('score').asc(), F('id').asc()],
+        ),
+        total=Window(
+            expression=Count('id'),
+            partition_by=F('recipe_id'),
+        ),
+    ).filter(
+        position=1,
+    ).values_list('recipe_id', 'id', 'score', 'total')
+    lowest = {
+        other_id: (row_id, score, total)
+        for other_id, row_id, score, total in lists
+    }
+    evicted = []
+    added = []
+    for other_id, score in scores.items():
+        row_id, low, total = lowest.get(other_id, (None, 0, 0))
+        if total >= settings.SIMILAR_RECIPES_COUNT:
+            if score <= low:
+                continue
+            evicted.append(row_id)
+        added.append(SimilarRecipe(
+            recipe_id=other_id, similar_id=recipe_id, score=score,
+        ))
+    SimilarRecipe.objects.filter(id__in=evicted).delete()
+    SimilarRecipe.objects.bulk_create(added)
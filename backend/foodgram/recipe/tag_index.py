@@ -0,0 +1,97 @@
+from django.conf import settings
+
+from core.indexes import CachedIndex
+from recipe.models import Recipe
+
+BYTE_BITS = [
+    tuple(bit for bit in range(8) if value >> bit & 1)
+    for value in range(256)
+]
+
+
+def to_bitmap(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for value in ids:
+        buffer[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def to_ids(bitmap):
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    return [
+        index * 8 + bit
+        for index, byte in enumerate(data) if byte
+        for bit in BYTE_BITS[byte]
+    ]
+
+
+def cardinality(bitmap):
+    return bin(bitmap).count('1')
+
+
+class TagIndex(CachedIndex):
+    """Битовые карты id рецептов по тегам.
+
+    Карта хранится в целом числе Python: id рецептов идут подряд,
+    поэтому плотное представление компактнее списка, а объединение и
+    пересечение выполняются одной операцией над числами.
+    """
+
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._bitmaps = {}
+
+    def load(self):
+        ids = {}
+        links = Recipe.tags.through.objects.values_list(
+            'tag_id', 'recipe_id',
+        )
+        for tag_id, recipe_id in links.iterator(chunk_size=10000):
+            ids.setdefault(tag_id, []).append(recipe_id)
+        return {
+            tag_id: to_bitmap(recipe_ids)
+            for tag_id, recipe_ids in ids.items()
+        }
+
+    def publish(self, bitmaps):
+        self._bitmaps = bitmaps
+
+    def add(self, recipe_id, tag_ids):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for tag_id in tag_ids:
+                self._bitmaps[tag_id] = (
+                    self._bitmaps.get(tag_id, 0) | 1 << recipe_id
+                )
+
+    def remove(self, recipe_id, tag_ids=None):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for tag_id in tag_ids or list(self._bitmaps):
+                if tag_id in self._bitmaps:
+                    self._bitmaps[tag_id] &= ~(1 << recipe_id)
+
+    def remove_tag(self, tag_id):
+        with self._lock:
+            self._bitmaps.pop(tag_id, None)
+
+    def match(self, tag_ids, require_all=False):
+        self._ensure_built()
+        bitmaps = [self._bitmaps.get(tag_id, 0) for tag_id in tag_ids]
+        if not bitmaps:
+            return 0
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            if require_all:
+                result &= bitmap
+            else:
+                result |= bitmap
+        return result
+
+
+tag_index = TagIndex(settings.TAG_INDEX_TTL)
@@ -0,0 +1,34 @@
+from django.db.models import F
+from django.utils import timezone
+
+from recipe.models import Version
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def bump(name, **fields):
+    updated = Version.objects.filter(name=name).update(
+        value=F('value') + 1,
+        updated=timezone.now(),
+        **fields,
+    )
+    if not updated:
+        Version.objects.get_or_create(name=name, defaults=fields)
+
+
+def checksum(name):
+    return Version.objects.filter(name=name).values_list(
+        'checksum',
+        flat=True,
+    ).first()
+
+
+def current(*names):
+    versions = {
+        name: (value, updated)
+        for name, value, updated in Version.objects.filter(
+            name__in=names,
+        ).values_list('name', 'value', 'updated')
+    }
+    return [versions.get(name, (0, None)) for name in names]
@@ -46,9 +46,10 @@ class UserAdmin(UserAdmin):
         'email',
     )
     list_filter = (
-        'username',
-        'email',
+        'is_staff',
+        'is_active',
     )
+    show_full_result_count = False
 
 
 @admin.register(Follow)
@@ -58,6 +59,15 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+    list_select_related = (
+        'user',
+        'author',
+    )
+    autocomplete_fields = (
+        'user',
+        'author',
+    )
+    show_full_result_count = False
     search_fields = (
         'user__username',
         'author__username',
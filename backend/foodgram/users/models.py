@@ -28,6 +28,10 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=150,
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         ordering = ['id']
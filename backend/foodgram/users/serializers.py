@@ -42,11 +42,16 @@ class SignUpSerializer(UserSerializer):
         read_only_fields = ['id', 'is_subscribed']
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return Follow.objects.filter(
-            author=obj.id,
-            user=user.id,
-        ).exists()
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is None:
+            subscriptions = set()
+            request = self.context.get('request')
+            if request is not None and request.user.is_authenticated:
+                subscriptions = set(Follow.objects.filter(
+                    user=request.user,
+                ).values_list('author_id', flat=True))
+            self.context['subscriptions'] = subscriptions
+        return obj.id in subscriptions
 
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
@@ -63,6 +68,13 @@ class SpecialRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit', '')
+    if limit.isdigit():
+        return int(limit)
+    return None
+
+
 class FollowSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     id = serializers.ReadOnlyField(source='author.id')
@@ -87,19 +99,20 @@ class FollowSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return Follow.objects.filter(
-            author=obj.author,
-            user=user,
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').GET.get('recipes_limit')
-        recipe_obj = obj.author.recipe.all()
-        if limit:
-            recipe_obj = recipe_obj[:int(limit)]
-        serializer = SpecialRecipeSerializer(recipe_obj, many=True)
+        if hasattr(obj.author, 'latest_recipes'):
+            recipes = obj.author.latest_recipes
+        else:
+            recipes = obj.author.recipe.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit is not None:
+                recipes = recipes[:limit]
+        serializer = SpecialRecipeSerializer(recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.author.recipe.count()
@@ -1,3 +1,6 @@
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from djoser.serializers import SetPasswordSerializer
 from djoser.views import UserViewSet
@@ -9,18 +12,23 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
-from core.pagination import LargeResultsSetPagination
+from core.pagination import FeedPagination, bump_count_generation
+from core.relations import delete_present, insert_missing
+from recipe import feed
+from recipe.models import Recipe
 from users.models import User, Follow
 from .serializers import (
     MeSerializer,
     SignUpSerializer,
     FollowSerializer,
+    get_recipes_limit,
 )
 
 
 class SignUp(UserViewSet):
     queryset = User.objects.all()
-    pagination_class = LargeResultsSetPagination
+    pagination_class = FeedPagination
+    cursor_ordering = ('id',)
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_serializer_class(self):
@@ -49,8 +57,29 @@ class SignUp(UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        user = request.user
-        queryset = user.follower.all()
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author'),
+                    order_by=[F('pub_date').desc(), F('id').desc()],
+                ),
+            ).filter(row_number__lte=limit)
+        queryset = request.user.follower.select_related(
+            'author',
+        ).annotate(
+            recipes_count=Count('author__recipe'),
+        ).order_by(
+            'id',
+        ).prefetch_related(
+            Prefetch(
+                'author__recipe',
+                queryset=recipes,
+                to_attr='latest_recipes',
+            ),
+        )
         pages = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             pages,
@@ -73,34 +102,38 @@ class SignUp(UserViewSet):
                 {'errors': 'Попытка подписки/отписки на/от себя.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        follow = Follow.objects.filter(
-            author=author,
-            user=user,
-        )
-
         if request.method == 'POST':
-            if follow.exists():
+            with transaction.atomic():
+                added = insert_missing(
+                    Follow, 'author_id', [author.id], user_id=user.id,
+                )
+                if added:
+                    feed.backfill(user.id, author.id)
+                    bump_count_generation(Follow)
+            if not added:
                 return Response(
                     {'errors': f'Вы уже подписаны на {author.username}'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            queryset = Follow.objects.create(
-                author=author,
-                user=user,
-            )
             serializer = FollowSerializer(
-                queryset,
+                Follow(user=user, author=author),
                 context={'request': request},
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            if not follow.exists():
+            with transaction.atomic():
+                removed = delete_present(
+                    Follow, 'author_id', [author.id], user_id=user.id,
+                )
+                if removed:
+                    feed.forget(user.id, author.id)
+                    bump_count_generation(Follow)
+            if not removed:
                 return Response(
                     {'errors': f'Нет подписки на {author.username}'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            follow.delete()
             return Response(
                 {f'Вы отписаны от пользователя {author.username}'},
                 status=status.HTTP_204_NO_CONTENT,